@@ -6,10 +6,101 @@ import jishaku
 import datetime
 
 from discord.ext import commands
+from cogs.utils.web import WebClient
+from cogs.utils.ipc import ClusterIPC
+from cogs.utils.stats import GuildStats, MemberIndex
+from cogs.utils.config import GuildConfig, PrefixStore
+from cogs.utils.modlog import ModlogWriter
+from cogs.utils.cases import CaseStore
+from cogs.utils.paginator import PaginatorRouter
+from cogs.utils.helpindex import HelpIndex
+from cogs.utils.ratelimit import RateLimiter, parse_limits
+from cogs.utils.breaker import Breakers
 
-bot = commands.Bot(command_prefix="c;")
+# (requests per second, burst) per upstream host, RATE_LIMITS overrides these
+UPSTREAM_LIMITS = {
+	"some-random-api.ml": (2.0, 5),
+	"www.reddit.com": (0.5, 2),
+	"api.coindesk.com": (1.0, 3),
+	"api.github.com": (0.5, 5),
+	"nekos.life": (2.0, 5),
+	"icanhazdadjoke.com": (1.0, 3),
+	"translate.google.com": (1.0, 3),
+}
+
+def parse_shard_ids(value):
+	"""Parses ``"0-3"`` or ``"0,1,2"`` style shard id lists"""
+	if not value:
+		return None
+	ids = []
+	for part in value.split(","):
+		if "-" in part:
+			start, end = part.split("-")
+			ids.extend(range(int(start), int(end) + 1))
+		else:
+			ids.append(int(part))
+	return ids
+
+def get_prefix(bot, message):
+	"""Resolves the guild prefix from memory, this runs on every message"""
+	if message.guild is None:
+		prefix = bot.prefixes.default
+	else:
+		prefix = bot.prefixes.get(message.guild.id)
+	return commands.when_mentioned_or(prefix)(bot, message)
+
+class C02(commands.AutoShardedBot):
+	def __init__(self, **kwargs):
+		super().__init__(**kwargs)
+		self.limiter = RateLimiter({**UPSTREAM_LIMITS, **parse_limits(os.getenv("RATE_LIMITS"))})
+		self.breakers = Breakers()
+		self.web = WebClient(loop=self.loop, limiter=self.limiter, breakers=self.breakers)
+		db_path = os.getenv("DATABASE", "c02.db")
+		self.db = sqlite3.connect(db_path)
+		self.config = GuildConfig(self.db)
+		self.cases = CaseStore(self.db)
+		self.prefixes = PrefixStore(self.db, db_path, loop=self.loop, default="c;")
+		self.modlog = ModlogWriter(loop=self.loop)
+		self.paginators = PaginatorRouter(self)
+		# only set when running under launcher.py
+		self.ipc = ClusterIPC(self, path=os.getenv("IPC_SOCKET"), cluster_id=int(os.getenv("CLUSTER_ID", "0")))
+		self.ipc.start()
+		self.stats = GuildStats(self)
+		self.stats.setup()
+		self.member_index = MemberIndex(self)
+		self.member_index.setup()
+		self.help_index = HelpIndex(self)
+		
+	# the help index is rebuilt lazily after any extension change
+	def load_extension(self, name):
+		super().load_extension(name)
+		self.help_index.invalidate()
+		
+	def unload_extension(self, name):
+		super().unload_extension(name)
+		self.help_index.invalidate()
+		
+	def reload_extension(self, name):
+		super().reload_extension(name)
+		self.help_index.invalidate()
+		
+	async def close(self):
+		# run() closes again after logout() has already done so
+		if self.is_closed():
+			return
+		await self.modlog.close()
+		await self.ipc.close()
+		await self.web.close()
+		await self.prefixes.close()
+		self.db.close()
+		await super().close()
 
 token = os.getenv("TOKEN")
+shard_count = os.getenv("SHARD_COUNT")
+shard_ids = parse_shard_ids(os.getenv("SHARD_IDS"))
+
+# without SHARD_COUNT discord tells us how many shards we need
+bot = C02(command_prefix=get_prefix, shard_count=int(shard_count) if shard_count else None, shard_ids=shard_ids)
 
 @bot.event
 async def on_ready():
@@ -39,7 +130,7 @@ async def unload(ctx, extension):
 	if "".join(extension.lower().split()).strip() == "all":
 		for filename in os.listdir("./cogs"):
 			if filename.endswith(".py"):
-				bot.load_extension(f"cogs.{filename[:-3]}")
+				bot.unload_extension(f"cogs.{filename[:-3]}")
 	else:
 		bot.unload_extension(f"cogs.{extension}")
 	
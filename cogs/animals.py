@@ -1,59 +1,151 @@
 import discord
-import requests
+import time
+import asyncio
+import aiohttp
+import collections
 
 from discord.ext import commands
 from discord import Embed
+from .utils.ratelimit import RateLimited, share_key
+from .utils.breaker import within_budget
+
+class AnimalPool:
+	"""A bounded pool of pre-fetched results for one endpoint.
+
+	Entries are served least recently used first and expire after ``ttl``
+	seconds. When fewer than ``low_water`` entries are left the pool is
+	refilled in the background. Expired entries are kept aside and served
+	while the refill runs, so a slow or dead upstream doesn't keep users
+	waiting as long as the pool has ever had anything in it.
+	"""
+	def __init__(self, bot, fetch, *, maxsize=20, low_water=5, ttl=600.0):
+		self.bot = bot
+		self.fetch = fetch
+		self.maxsize = maxsize
+		self.low_water = low_water
+		self.ttl = ttl
+		self.entries = collections.OrderedDict()
+		self.stale = collections.deque(maxlen=maxsize)
+		self._refill_task = None
+
+	def __len__(self):
+		return len(self.entries)
+
+	def expire(self):
+		now = time.monotonic()
+		for value, expires in list(self.entries.items()):
+			if expires <= now:
+				del self.entries[value]
+				self.stale.append(value)
+
+	def add(self, value):
+		if value in self.entries:
+			self.entries.move_to_end(value)
+			return
+		self.entries[value] = time.monotonic() + self.ttl
+		while len(self.entries) > self.maxsize:
+			self.entries.popitem(last=False)
+
+	async def refill(self):
+		while len(self.entries) < self.maxsize:
+			before = len(self.entries)
+			try:
+				# never queue for a token, but a refill still takes every free one,
+				# so a command on a cold pool may wait up to its deadline behind it
+				self.add(await self.fetch(deadline=0.0))
+			except RateLimited as e:
+				# wait for the next spare token instead of stopping short of maxsize
+				await asyncio.sleep(e.retry_after)
+				continue
+			except Exception:
+				return
+			if len(self.entries) == before:
+				# upstream keeps giving us values we already have
+				return
+
+	def schedule_refill(self):
+		if self._refill_task is None or self._refill_task.done():
+			self._refill_task = self.bot.loop.create_task(self.refill())
+
+	async def get(self, guild_id=None):
+		self.expire()
+		if self.entries:
+			value = next(iter(self.entries))
+			self.entries.move_to_end(value)
+		elif self.stale:
+			# serve the last good values until the refill catches up
+			value = self.stale[0]
+			self.stale.rotate(-1)
+		else:
+			value = await self.fetch(guild_id=guild_id)
+			self.add(value)
+		if len(self.entries) < self.low_water:
+			self.schedule_refill()
+		return value
+
+	def cancel(self):
+		if self._refill_task is not None:
+			self._refill_task.cancel()
 
 class Animals(commands.Cog):
 	"""Commands related to animals"""
 	def __init__(self, bot):
 		self.bot = bot
-		
+		self.images = {}
+		self.facts_pool = {}
+
+	def cog_unload(self):
+		for pool in (*self.images.values(), *self.facts_pool.values()):
+			pool.cancel()
+
+	def get_pool(self, cache, endpoint, animal, key):
+		pool = cache.get(animal)
+		if pool is None:
+			async def fetch(guild_id=None, deadline=None):
+				url = f"https://some-random-api.ml/{endpoint}/{animal}"
+				data = await self.bot.web.get_json(url, guild_id=guild_id, deadline=deadline)
+				return data[key]
+			pool = cache[animal] = AnimalPool(self.bot, fetch)
+		return pool
+
 	@commands.command()
 	async def image(self, ctx, *, animal):
 		"""Gives you the random image of different animals"""
-		try:
-			animals = ("cat", "dog", "fox", "koala", "panda", "birb", "racoon", "kangaroo", "whale")
-			if not animal in animals:
-				await ctx.send(f"{animal} is not a valid animal\nValid animals are: cat, dog, fox, koala, panda, birb, racoon, kangaroo, whale")
-			
-			r = requests.get(f"https://some-random-api.ml/img/{animal}")
-			data = r.json()
-			url = data["link"]
-			embed = Embed()
-			if animal == "panda":
-				embed.title = ":panda_face: ~panda~"
-			elif animal == "racoon":
-				embed.title = ":raccoon: ~racoon~"
-			else:
-				embed.title = f":{animal}: ~{animal}~"
-			embed.set_image(url=url)
-			await ctx.send(embed=embed)
-			
-		except Exception:
-			pass
+		animals = ("cat", "dog", "fox", "koala", "panda", "birb", "racoon", "kangaroo", "whale")
+		if not animal in animals:
+			await ctx.send(f"{animal} is not a valid animal\nValid animals are: cat, dog, fox, koala, panda, birb, racoon, kangaroo, whale")
+			return
+		
+		pool = self.get_pool(self.images, "img", animal, "link")
+		url = await within_budget(pool.get(share_key(ctx)), f"a {animal} image", errors=(aiohttp.ClientError, ValueError, KeyError))
+		embed = Embed()
+		if animal == "panda":
+			embed.title = ":panda_face: ~panda~"
+		elif animal == "racoon":
+			embed.title = ":raccoon: ~racoon~"
+		else:
+			embed.title = f":{animal}: ~{animal}~"
+		embed.set_image(url=url)
+		await ctx.send(embed=embed)
 			
 	@commands.command()
 	async def facts(self, ctx, *, animal):
 		"""Gives you the facts of different animals"""
-		try:
-			animals = ("cat", "dog", "fox", "koala", "panda", "bird", "racoon", "kangaroo", "elephant", "giraffe", "whale")
-			if not animal in animals:
-				await ctx.send(f"{animal} is not a valid animal\nValid animals are: cat, dog, fox, koala, panda, bird, racoon, kangaroo, elephant, giraffe, whale")
-				
-			r = requests.get(f"https://some-random-api.ml/facts/{animal}")
-			f = r.json()
-			cont = f["fact"]
-			embed = discord.Embed(color=discord.Color.blurple(),description=cont)
-			if animal == "panda":
-				embed.title = f":panda_face: panda fact"
-			elif animal == "racoon":
-				embed.title = f":raccoon: racoon fact"
-			else:
-				embed.title = f":{animal}: {animal} fact"
-			await ctx.send(embed=embed)
-		except Exception:
-			pass
+		animals = ("cat", "dog", "fox", "koala", "panda", "bird", "racoon", "kangaroo", "elephant", "giraffe", "whale")
+		if not animal in animals:
+			await ctx.send(f"{animal} is not a valid animal\nValid animals are: cat, dog, fox, koala, panda, bird, racoon, kangaroo, elephant, giraffe, whale")
+			return
+			
+		pool = self.get_pool(self.facts_pool, "facts", animal, "fact")
+		cont = await within_budget(pool.get(share_key(ctx)), f"a {animal} fact", errors=(aiohttp.ClientError, ValueError, KeyError))
+		embed = discord.Embed(color=discord.Color.blurple(),description=cont)
+		if animal == "panda":
+			embed.title = f":panda_face: panda fact"
+		elif animal == "racoon":
+			embed.title = f":raccoon: racoon fact"
+		else:
+			embed.title = f":{animal}: {animal} fact"
+		await ctx.send(embed=embed)
 		
 def setup(bot):
 	bot.add_cog(Animals(bot))
\ No newline at end of file
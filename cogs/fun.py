@@ -1,22 +1,107 @@
 import discord
+import sys
 import random
-import aiohttp
+import asyncio
+import traceback
 import typing
-import box
-import json
+import collections
 import nekos
-import requests
+import aiohttp
 
-from discord.ext import commands
+from discord.ext import commands, tasks
 from dadjokes import Dadjoke
 from random_password import random_password
+from .utils.prefetch import PrefetchPool
+from .utils.ratelimit import share_key
+from .utils.breaker import within_budget
+
+class MemePool:
+	"""A deduplicated ring of ``(title, url)`` image posts.
+
+	Keeps track of what was recently shown per channel so the
+	same meme isn't posted twice in a row. Only the ``channels`` most
+	recently used channels are remembered.
+	"""
+	def __init__(self, *, maxsize=300, recent=25, channels=500):
+		self.maxsize = maxsize
+		self.recent_size = recent
+		self.channels = channels
+		self.memes = []
+		self.urls = set()
+		self.position = 0
+		self.recent = collections.OrderedDict()
+
+	def __len__(self):
+		return len(self.memes)
+
+	def add(self, title, url):
+		if url in self.urls:
+			return
+		if len(self.memes) < self.maxsize:
+			self.memes.append((title, url))
+		else:
+			_, old = self.memes[self.position]
+			self.urls.discard(old)
+			self.memes[self.position] = (title, url)
+			self.position = (self.position + 1) % self.maxsize
+		self.urls.add(url)
+
+	def pick(self, channel_id, *, tries=5):
+		recent = self.recent.get(channel_id)
+		if recent is None:
+			recent = self.recent[channel_id] = collections.deque(maxlen=self.recent_size)
+			while len(self.recent) > self.channels:
+				self.recent.popitem(last=False)
+		else:
+			self.recent.move_to_end(channel_id)
+		for _ in range(tries):
+			meme = random.choice(self.memes)
+			if meme[1] not in recent:
+				break
+		recent.append(meme[1])
+		return meme
 
 class Misc(commands.Cog):
 	"""Miscellenous Commands to make the server active and fun"""
 	def __init__(self, bot):
 		self.bot = bot
-		self.jokes = Dadjoke()
-		self.session = aiohttp.ClientSession()
+		self.memes = MemePool()
+		self.pool = PrefetchPool({
+			"slap": lambda: nekos.img("slap"),
+			"hug": lambda: nekos.img("hug"),
+			"dadjoke": lambda: Dadjoke().joke
+		}, loop=bot.loop, limiter=bot.limiter, breakers=bot.breakers, hosts={
+			"slap": "nekos.life",
+			"hug": "nekos.life",
+			"dadjoke": "icanhazdadjoke.com"
+		})
+		self.refresh_memes.start()
+		
+	def cog_unload(self):
+		self.refresh_memes.cancel()
+		self.pool.close()
+		
+	async def fetch_memes(self, guild_id=None):
+		r = await self.bot.web.get_json("https://www.reddit.com/r/dankmemes/top.json?sort=top&t=day&limit=100", guild_id=guild_id)
+		for child in r["data"]["children"]:
+			data = child["data"]
+			url = data.get("url", "")
+			if data.get("post_hint") == "image" or url.endswith((".jpg", ".jpeg", ".png", ".gif")):
+				self.memes.add(data["title"], url)
+				
+	@tasks.loop(minutes=30.0)
+	async def refresh_memes(self):
+		try:
+			await self.fetch_memes()
+		except asyncio.CancelledError:
+			raise
+		except Exception as e:
+			print("[Memes] refresh failed:", file=sys.stderr)
+			traceback.print_exception(type(e), e, e.__traceback__, file=sys.stderr)
+			
+	@refresh_memes.before_loop
+	async def before_refresh_memes(self):
+		await self.bot.wait_until_ready()
 		
 	@commands.command()
 	async def dice(self, ctx):
@@ -46,18 +131,18 @@ class Misc(commands.Cog):
 	async def dadjoke(self, ctx):
 		"""Sends the dadjokes"""
 		async with ctx.typing():
-			joke = self.jokes.joke
+			# the sources are third party libraries, anything they raise is an upstream failure
+			joke = await within_budget(self.pool.get("dadjoke", share_key(ctx)), "a dad joke", errors=Exception)
 			await ctx.send(joke)
 		
 	@commands.command()
 	async def meme(self, ctx):
 		"""Sends you random meme"""
-		r = await self.session.get("https://www.reddit.com/r/dankmemes/top.json?sort=top&t=day&limit=500")
-		r = await r.json()
-		r = box.Box(r)
-		data = random.choice(r.data.children).data
-		img = data.url
-		title = data.title
+		if not self.memes:
+			await within_budget(self.fetch_memes(share_key(ctx)), "memes", errors=(aiohttp.ClientError, ValueError, KeyError))
+		if not self.memes:
+			return await ctx.send("Couldn't find any memes right now, try again later")
+		title, img = self.memes.pick(ctx.channel.id)
 		embed = discord.Embed(title=title, color=discord.Color.blurple())
 		embed.set_image(url=img)
 		await ctx.send(embed=embed)
@@ -67,15 +152,13 @@ class Misc(commands.Cog):
 		"""
 		Shows the bitcoin current price
 		"""
-		r = await self.session.get("https://api.coindesk.com/v1/bpi/currentprice/BTC.json")
-		r = await r.text()
-		r = json.loads(r)
+		r = await within_budget(self.bot.web.get_json("https://api.coindesk.com/v1/bpi/currentprice/BTC.json", guild_id=share_key(ctx)), "the bitcoin price")
 		await ctx.send("Bitcoin Price(in $)" + r['bpi']['USD']['rate'])
 		
 	@commands.command()
 	async def slap(self, ctx, member: discord.Member):
 		"""Slaps the member"""
-		url = nekos.img("slap")
+		url = await within_budget(self.pool.get("slap", share_key(ctx)), "a slap gif", errors=Exception)
 		embed = discord.Embed(title=f"__**{ctx.author}**__ Slapped __**{member}**__")
 		embed.set_image(url=url)
 		await ctx.send(embed=embed)
@@ -83,7 +166,7 @@ class Misc(commands.Cog):
 	@commands.command()
 	async def hug(self, ctx, member: discord.Member):
 		"""Hugs the member"""
-		url = nekos.img("hug")
+		url = await within_budget(self.pool.get("hug", share_key(ctx)), "a hug gif", errors=Exception)
 		embed = discord.Embed(title=f"__**{ctx.author}**__ Hugged __**{member}**__")
 		embed.set_image(url=url)
 		await ctx.send(embed=embed)
@@ -93,5 +176,14 @@ class Misc(commands.Cog):
 		"""Repeat after you"""
 		await ctx.send(text)
 		
+	@commands.command(hidden=True)
+	@commands.is_owner()
+	async def poolstats(self, ctx):
+		"""Shows hit/miss counters of the prefetch pools"""
+		embed = discord.Embed(title="Prefetch Pools", color=discord.Color.blurple())
+		for name, (hits, misses, ready) in self.pool.stats().items():
+			embed.add_field(name=name, value=f"Hits - {hits}\nMisses - {misses}\nReady - {ready}")
+		await ctx.send(embed=embed)
+		
 def setup(bot):
 	bot.add_cog(Misc(bot))
\ No newline at end of file
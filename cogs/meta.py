@@ -1,18 +1,21 @@
 import discord
 import asyncio
 import time
-import itertools
+import collections
+import traceback
 import platform
 import datetime
-import requests
 import sys
 import os
 import inspect
 
 from discord.ext import commands
 from random import choice
-from googletrans import Translator
 from .utils.paginator import Pages
+from .utils.github import GitHubClient, GitHubError
+from .utils.translate import TranslationEngine
+from .utils.ratelimit import RateLimited, share_key
+from .utils.breaker import CircuitOpen, UpstreamFailed, within_budget
 
 class HelpPaginator(Pages):
     def __init__(self, help_command, ctx, entries, *, per_page=4):
@@ -41,8 +44,7 @@ class HelpPaginator(Pages):
         self.embed.set_footer(text=f'Use "{self.prefix}help command" for more info on a command.')
 
         for entry in entries:
-            signature = f'{entry.qualified_name} {entry.signature}'
-            self.embed.add_field(name=signature, value=entry.short_doc or "No help given", inline=False)
+            self.embed.add_field(name=entry.signature, value=entry.doc, inline=False)
 
         if self.maximum_pages:
             self.embed.set_author(name=f'Page {page}/{self.maximum_pages} ({self.total} commands)')
@@ -64,7 +66,7 @@ class HelpPaginator(Pages):
             await asyncio.sleep(30.0)
             await self.show_current_page()
 
-        self.bot.loop.create_task(go_back_to_current_page())
+        self.track(go_back_to_current_page())
 
     async def show_bot_help(self):
         """shows how to use the bot"""
@@ -90,7 +92,7 @@ class HelpPaginator(Pages):
             await asyncio.sleep(30.0)
             await self.show_current_page()
 
-        self.bot.loop.create_task(go_back_to_current_page())
+        self.track(go_back_to_current_page())
 
 class PaginatedHelpCommand(commands.HelpCommand):
     def __init__(self):
@@ -115,26 +117,42 @@ class PaginatedHelpCommand(commands.HelpCommand):
             alias = command.name if not parent else f'{parent} {command.name}'
         return f'{alias} {command.signature}'
 
-    async def send_bot_help(self, mapping):
-        def key(c):
-            return c.cog_name or '\u200bNo Category'
+    async def command_callback(self, ctx, *, command=None):
+        name, _, terms = (command or '').partition(' ')
+        if name.lower() == 'search' and terms.strip():
+            await self.prepare_help_command(ctx, command)
+            return await self.send_search_help(terms.strip())
+        return await super().command_callback(ctx, command=command)
+
+    async def send_search_help(self, terms):
+        index = self.context.bot.help_index
+        entries = await index.filter(self.context, index.search(terms))
+        if not entries:
+            return await self.context.send(f'No commands found for "{terms}".')
 
-        bot = self.context.bot
-        entries = await self.filter_commands(bot.commands, sort=True, key=key)
+        pages = HelpPaginator(self, self.context, entries)
+        pages.title = f'Results for "{terms}"'
+        pages.description = discord.Embed.Empty
+        await pages.paginate()
+
+    async def filter_entries(self, cmds):
+        index = self.context.bot.help_index
+        entries = sorted((index.entry(c) for c in cmds), key=lambda e: e.name)
+        return await index.filter(self.context, entries)
+
+    async def send_bot_help(self, mapping):
+        index = self.context.bot.help_index
         nested_pages = []
         per_page = 9
         total = 0
 
-        for cog, commands in itertools.groupby(entries, key=key):
-            commands = sorted(commands, key=lambda c: c.name)
-            if len(commands) == 0:
+        for cog, description, entries in index.cogs:
+            entries = await index.filter(self.context, entries)
+            if len(entries) == 0:
                 continue
 
-            total += len(commands)
-            actual_cog = bot.get_cog(cog)
-            # get the description if it exists (and the cog is valid) or return Empty embed.
-            description = (actual_cog and actual_cog.description) or discord.Embed.Empty
-            nested_pages.extend((cog, description, commands[i:i + per_page]) for i in range(0, len(commands), per_page))
+            total += len(entries)
+            nested_pages.extend((cog, description, entries[i:i + per_page]) for i in range(0, len(entries), per_page))
 
         # a value of 1 forces the pagination session
         pages = HelpPaginator(self, self.context, nested_pages, per_page=1)
@@ -146,7 +164,7 @@ class PaginatedHelpCommand(commands.HelpCommand):
         await pages.paginate()
 
     async def send_cog_help(self, cog):
-        entries = await self.filter_commands(cog.get_commands(), sort=True)
+        entries = await self.filter_entries(cog.get_commands())
         pages = HelpPaginator(self, self.context, entries)
         pages.title = f'{cog.qualified_name} Commands'
         pages.description = cog.description
@@ -171,7 +189,7 @@ class PaginatedHelpCommand(commands.HelpCommand):
         if len(subcommands) == 0:
             return await self.send_command_help(group)
 
-        entries = await self.filter_commands(subcommands, sort=True)
+        entries = await self.filter_entries(subcommands)
         pages = HelpPaginator(self, self.context, entries)
         self.common_command_formatting(pages, group)
         await pages.paginate()
@@ -181,14 +199,38 @@ class Meta(commands.Cog):
     
     def __init__(self, bot):
         self.bot = bot
-        self.translator = Translator()
+        self.translator = TranslationEngine(loop=bot.loop, limiter=bot.limiter, breakers=bot.breakers)
+        self.github_client = GitHubClient(bot.web)
         self.old_help_command = bot.help_command
         bot.help_command = PaginatedHelpCommand()
         bot.help_command.cog = self
         self.start_time = datetime.datetime.utcnow()
+        bot.ipc.handlers["stats"] = self.cluster_stats
+        bot.ipc.handlers["shared_guilds"] = self.shared_guilds
 
     def cog_unload(self):
         self.bot.help_command = self.old_help_command
+        self.bot.ipc.handlers.pop("stats", None)
+        self.bot.ipc.handlers.pop("shared_guilds", None)
+        self.translator.close()
+
+    @commands.Cog.listener()
+    async def on_command_error(self, ctx, error):
+        if isinstance(error, commands.CommandInvokeError) and isinstance(error.original, (RateLimited, CircuitOpen, UpstreamFailed)):
+            return await ctx.send(str(error.original))
+
+        if not isinstance(error, commands.CommandNotFound):
+            # having a listener turns off the default handler, so keep its output
+            if not hasattr(ctx.command, 'on_error'):
+                print(f'Ignoring exception in command {ctx.command}:', file=sys.stderr)
+                traceback.print_exception(type(error), error, error.__traceback__, file=sys.stderr)
+            return
+
+        index = self.bot.help_index
+        suggestions = await index.filter(ctx, index.suggest(ctx.invoked_with))
+        if suggestions:
+            names = ', '.join(f'`{ctx.prefix}{e.name}`' for e in suggestions[:3])
+            await ctx.send(f'Command `{ctx.invoked_with}` not found. Did you mean {names}?')
        
     @commands.command()
     async def ping(self, ctx):
@@ -199,6 +241,9 @@ class Meta(commands.Cog):
     	duration = (start - end) * 1000
     	embed = discord.Embed(color=discord.Color.blurple())
     	embed.add_field(name="Ping", value=f"**Message Responce**: {duration:.2f}ms\n**Websocket Latency**: {round(self.bot.latency * 1000)}ms")
+    	shards = [f"Shard {shard_id} - {round(latency * 1000)}ms" for shard_id, latency in self.bot.latencies]
+    	if len(shards) > 1:
+    		embed.add_field(name="Shards", value="\n".join(shards[:20]))
     	await msg.edit(embed=embed)
     	
     @commands.command()
@@ -218,6 +263,27 @@ class Meta(commands.Cog):
     	"""Shutdown the bot - Only owners can do this"""
     	await self.bot.logout()
     	
+    @commands.command(hidden=True)
+    @commands.is_owner()
+    async def upstreams(self, ctx):
+    	"""Shows the circuit breakers and rate limits of the upstream APIs"""
+    	breakers = self.bot.breakers.stats()
+    	limits = self.bot.limiter.stats()
+    	embed = discord.Embed(title="Upstreams", color=discord.Color.blurple())
+    	for host in sorted(set(breakers) | set(limits), key=str)[:25]:
+    		lines = []
+    		if host in breakers:
+    			state, failures, retry_after = breakers[host]
+    			lines.append(f"**Circuit**: {state} ({failures} failures)")
+    			if retry_after:
+    				lines.append(f"**Retry In**: {retry_after:.0f}s")
+    		if host in limits:
+    			tokens, allowed, delayed, rejected = limits[host]
+    			lines.append(f"**Tokens**: {tokens:.1f}")
+    			lines.append(f"**Allowed/Delayed/Rejected**: {allowed}/{delayed}/{rejected}")
+    		embed.add_field(name=str(host), value="\n".join(lines))
+    	await ctx.send(embed=embed)
+    	
     def get_uptime(self, *, brief=False):
     	uptime = datetime.datetime.utcnow() - self.start_time
     	(hours, remainder) = divmod(int(uptime.total_seconds()), 3600)
@@ -235,28 +301,37 @@ class Meta(commands.Cog):
     			fmt = f'{d}d' + fmt
     	return fmt.format(d=days, h=hours, m=minutes, s=seconds)
     	
+    def cluster_stats(self):
+    	"""Counts for the shards this process owns"""
+    	totals = self.bot.stats.totals
+    	return {"guilds": len(self.bot.guilds), "users": len(self.bot.users), "text": totals["text"], "voice": totals["voice"]}
+    	
+    def shared_guilds(self, user_id):
+    	return self.bot.member_index.shared(user_id)
+    	
     @commands.command(aliases=['bi'])
     async def about(self, ctx):
     	"""Shows info bot"""
     	bot = self.bot
     	uptime = self.get_uptime(brief=True)
     	plat = platform.python_version()
-    	users = len(bot.users)
-    	guilds = len(bot.guilds)
-    	textc = 0
-    	voicec = 0
-    	for guild in self.bot.guilds:
-    		for channel in guild.channels:
-    			if isinstance(channel, discord.TextChannel):
-    				textc += 1
-    			if isinstance(channel, discord.VoiceChannel):
-    				voicec += 1
+    	stats = collections.Counter()
+    	for cluster in await bot.ipc.gather("stats"):
+    		stats.update(cluster)
+    	users = stats["users"]
+    	guilds = stats["guilds"]
+    	textc = stats["text"]
+    	voicec = stats["voice"]
     	embed = discord.Embed(color=discord.Color.blurple())
     	embed.url = "https://discord.gg/2Vv3dct"
     	embed.title = 'Official server of C02'
     	embed.add_field(name="Developer", value="<@675261346669002752>")
     	embed.add_field(name="Stats", value=f"Used By - {users}\nGuilds - {guilds}\nLibrary - discord.py({discord.__version__})\nText Channels - {textc}\nVoice Channels - {voicec}\nUptime - {uptime}")
     	embed.add_field(name="System Stats", value=f"Python Version - {plat}\nCommands - {len(bot.commands)}\nPlatform - {sys.platform}")
+    	if bot.shard_count and bot.shard_count > 1:
+    		per_shard = collections.Counter(g.shard_id for g in bot.guilds)
+    		shards = [f"Shard {shard_id} - {per_shard[shard_id]} guilds" for shard_id in sorted(bot.shards)]
+    		embed.add_field(name="Shards", value="\n".join(shards[:20]))
     	await ctx.send(embed=embed)
     	
     @commands.command()
@@ -283,7 +358,7 @@ class Meta(commands.Cog):
     	roles = ""
     	for role in member.roles:
     		roles += role.mention
-    	servers = sum(g.get_member(member.id) is not None for g in self.bot.guilds)
+    	servers = sum(await self.bot.ipc.gather("shared_guilds", user_id=member.id))
     	embed.add_field(name="ID", value=member.id)
     	embed.add_field(name="Servers", value=f'{servers} shared')
     	embed.add_field(name="Roles", value=f"All Roles: {roles}\nTop Role: {member.top_role.mention}")
@@ -326,23 +401,11 @@ class Meta(commands.Cog):
     	if info:
     		embed.add_field(name="Features", value="\n".join(info))
     		
-    	online = len([m.id for m in ctx.guild.members if m.status == discord.Status.online])
-    	idle = len([m.id for m in ctx.guild.members if m.status == discord.Status.idle])
-    	dnd = len([m.id for m in ctx.guild.members if m.status == discord.Status.dnd])
-    	offline = len([m.id for m in ctx.guild.members if m.status == discord.Status.offline])
-    	bot = 0
-    	humans = 0
-    	total = 0
-    	for x in ctx.guild.members:
-    		if x.bot == True:
-    			bot += 1
-    			total += 1
-    		else:
-    			humans += 1
-    			total += 1
+    	stats = self.bot.stats.get(guild)
+    	total = stats["bots"] + stats["humans"]
     			
-    	embed.add_field(name="Members", value=f"Online - {online} members\nIdle - {idle} members\nDo Not Disturb - {dnd} members\nOffline - {offline} members\nTotal - {total} members")
-    	embed.add_field(name="Channels", value=f"Text Channels - {len(guild.text_channels)}\nVoice Channels - {len(guild.voice_channels)}\nTotal Channels - {(len(guild.text_channels) + len(guild.voice_channels))}")
+    	embed.add_field(name="Members", value=f"Online - {stats['online']} members\nIdle - {stats['idle']} members\nDo Not Disturb - {stats['dnd']} members\nOffline - {stats['offline']} members\nTotal - {total} members")
+    	embed.add_field(name="Channels", value=f"Text Channels - {stats['text']}\nVoice Channels - {stats['voice']}\nTotal Channels - {stats['text'] + stats['voice']}")
     	embed.add_field(name="Emojis & Roles", value=f"Emojis - {len(guild.emojis)}\nRoles - {len(guild.roles)}")
     	
     	await ctx.send(embed=embed)
@@ -372,8 +435,10 @@ class Meta(commands.Cog):
     		await ctx.send("No username provided")
     		await ctx.message.add_reaction('\N{NO ENTRY SIGN}')
     	else:
-    		r = requests.get(f"https://api.github.com/users/{github_username}")
-    		resp = r.json()
+    		try:
+    			resp = await within_budget(self.github_client.user(github_username, share_key(ctx)), "that GitHub user")
+    		except GitHubError as e:
+    			return await ctx.send(str(e))
     		name = resp['login']
     		id = resp['id']
     		avatar_url = resp['avatar_url']
@@ -401,8 +466,10 @@ class Meta(commands.Cog):
     		await ctx.send("No Owner/Repository name provided")
     		await ctx.message.add_reaction("\N{NO ENTRY SIGN}")
     	else:
-    		r = requests.get(f"https://api.github.com/repos/{owner}/{reponame}")
-    		r = r.json()
+    		try:
+    			r = await within_budget(self.github_client.repo(owner, reponame, share_key(ctx)), "that repository")
+    		except GitHubError as e:
+    			return await ctx.send(str(e))
     		tname = r["full_name"]
     		turl = r["html_url"]
     		id = r["id"]
@@ -437,7 +504,7 @@ class Meta(commands.Cog):
     @commands.command()
     async def translate(self, ctx, *, message):
     	"""Translate the given message to english"""
-    	tcont = self.translator.translate(message)
+    	tcont = await within_budget(self.translator.translate(message, guild_id=share_key(ctx)), "a translation", errors=Exception)
     	embed = discord.Embed()
     	embed.color = 0x00ffff
     	embed.description = tcont.text
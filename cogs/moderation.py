@@ -1,10 +1,82 @@
 import discord
+import re
+import shlex
+import argparse
+import datetime
+import typing
 from types import SimpleNamespace
 from discord.ext import commands
+from .utils.bans import BanIndex
+from .utils.batch import BatchQueue
+from .utils.permissions import OverwriteFanout, muted_overwrite
+from .utils.paginator import Pages, CallablePageSource
 
+class Arguments(argparse.ArgumentParser):
+	def error(self, message):
+		raise RuntimeError(message)
+
+class CasePages(Pages):
+	"""Fetches every page of cases from the database when it is shown"""
+	def __init__(self, ctx, cases, *, target_id=None, per_page=10, title=None):
+		self.cases = cases
+		self.guild_id = ctx.guild.id
+		self.target_id = target_id
+		total = cases.count(self.guild_id, target_id=target_id)
+		pages, left_over = divmod(total, per_page)
+		source = CallablePageSource(self.fetch_cases, maximum_pages=pages + bool(left_over), total=total)
+		super().__init__(ctx, source=source, per_page=per_page, nocount=True, title=title)
+		
+	def fetch_cases(self, page):
+		rows = self.cases.page(self.guild_id, (page - 1) * self.per_page, self.per_page, target_id=self.target_id)
+		return [f"**#{c.number}** {c.action} {c.target_name} by <@{c.moderator_id}> - {c.reason or 'No reason'}" for c in rows]
+		
 class Moderation(commands.Cog):
 	def __init__(self, bot):
 		self.bot = bot
+		self.queue = BatchQueue()
+		self.fanout = OverwriteFanout(self.queue)
+		self.bans = BanIndex()
+		
+	def record(self, ctx, action, target, reason):
+		return self.bot.cases.add(ctx.guild.id, action, target.id, str(target), ctx.author.id, reason)
+		
+	async def send_modlog(self, ctx, content):
+		ch = self.bot.config.modlog(ctx.guild)
+		if ch == None:
+			await ctx.send(f"Please setup modlog for the bot\nTo Setup: {ctx.prefix}setup modlog")
+		else:
+			# the writer batches entries, this only waits when its queue is full
+			await self.bot.modlog.put(ch, content)
+			
+	async def provision_muted(self, ctx, role):
+		msg = await ctx.send(f"Setting up the {role.name} role...")
+		
+		async def progress(done, total):
+			await msg.edit(content=f"Setting up the {role.name} role... {done}/{total} channels")
+			
+		jobs = [(channel, role, muted_overwrite(channel)) for channel in ctx.guild.channels]
+		applied, skipped, failed = await self.fanout.apply(jobs, reason=f"{role.name} role setup", progress=progress)
+		await msg.edit(content=f"{role.name} role is set up\nUpdated - {applied}\nAlready set - {skipped}\nFailed - {failed}")
+		
+	@commands.Cog.listener()
+	async def on_guild_channel_delete(self, channel):
+		self.bot.config.invalidate(channel.guild.id, "modlog_channel_id", channel.id)
+		
+	@commands.Cog.listener()
+	async def on_guild_role_delete(self, role):
+		self.bot.config.invalidate(role.guild.id, "muted_role_id", role.id)
+		
+	@commands.Cog.listener()
+	async def on_member_ban(self, guild, user):
+		self.bans.on_ban(guild, user)
+		
+	@commands.Cog.listener()
+	async def on_member_unban(self, guild, user):
+		self.bans.on_unban(guild, user)
+		
+	@commands.Cog.listener()
+	async def on_guild_remove(self, guild):
+		self.bans.forget(guild)
 		
 	@commands.group(invoke_without_command=True)
 	async def setup(self, ctx):
@@ -31,21 +103,107 @@ class Moderation(commands.Cog):
 			await category.edit(position=0)
 			
 			ch = await ctx.guild.create_text_channel(name='mod-log', category=category)
+			self.bot.config.set(ctx.guild.id, modlog_channel_id=ch.id)
+			
+			# a new channel doesn't get the overwrites of its category
+			jobs = [(channel, target, overwrite) for channel in (category, ch) for target, overwrite in overwrites.items()]
+			await self.fanout.apply(jobs, reason="mod-log setup")
 			
 			await ch.send("Successfully setted up mod-log\nNow in this channel all mod log will be sent")
+			
+	@setup.command()
+	async def prefix(self, ctx, *, prefix=None):
+		"""
+		Sets the command prefix for the server
+		
+		Leave the prefix out to go back to the default one
+		"""
+		if ctx.author.guild_permissions.administrator:
+			if prefix is not None and len(prefix) > 10:
+				return await ctx.send("Prefix can't be longer than 10 characters")
+			self.bot.prefixes.set(ctx.guild.id, prefix)
+			await ctx.send(f"Prefix is now `{self.bot.prefixes.get(ctx.guild.id)}`")
+		
+	def purge_check(self, args):
+		parser = Arguments(add_help=False, allow_abbrev=False)
+		parser.add_argument("--user", type=int, action="append")
+		parser.add_argument("--bots", action="store_true")
+		parser.add_argument("--contains")
+		parser.add_argument("--regex")
+		parser.add_argument("--attachments", action="store_true")
+		parser.add_argument("--before", type=int)
+		parser.add_argument("--after", type=int)
+		args = parser.parse_args(shlex.split(args or ""))
+		
+		users = set(args.user or ())
+		contains = args.contains.lower() if args.contains else None
+		regex = re.compile(args.regex) if args.regex else None
+		
+		def check(message):
+			if users and message.author.id not in users:
+				return False
+			if args.bots and not message.author.bot:
+				return False
+			if contains is not None and contains not in message.content.lower():
+				return False
+			if regex is not None and not regex.search(message.content):
+				return False
+			if args.attachments and not message.attachments:
+				return False
+			return True
+			
+		return check, args.before, args.after
+		
+	async def delete_batch(self, channel, batch):
+		if len(batch) == 1:
+			await batch[0].delete()
+		elif batch:
+			await channel.delete_messages(batch)
+		batch.clear()
 		
 	@commands.command(aliases=["del"])
-	async def purge(self, ctx, limit: int):
+	async def purge(self, ctx, limit: int, *, filters=None):
 		"""
 		Clear the given messages
+		
+		Searches the last <limit> messages, filters:
+		--user ID, --bots, --contains TEXT, --regex PATTERN,
+		--attachments, --before MESSAGE_ID, --after MESSAGE_ID
 		"""
 		if ctx.author.guild_permissions.manage_messages:
-			await ctx.channel.purge(limit=limit)
-			ch = discord.utils.get(ctx.guild.text_channels, name="mod-log")
-			if ch == None:
-				await ctx.send(f"Please setup modlog for the bot\nTo Setup: {ctx.prefix}setup modlog")
-			else:
-				await ch.send(f"Sucessfully deleted {limit} of messages\nModerator: {ctx.author.name}")
+			try:
+				check, before, after = self.purge_check(filters)
+			except (RuntimeError, ValueError, re.error) as e:
+				return await ctx.send(str(e))
+				
+			try:
+				await ctx.message.delete()
+			except discord.HTTPException:
+				pass
+				
+			before = discord.Object(id=before) if before else ctx.message
+			after = discord.Object(id=after) if after else None
+			# bulk delete refuses messages older than 14 days
+			cutoff = datetime.datetime.utcnow() - datetime.timedelta(days=14, minutes=-1)
+			batch = []
+			deleted = 0
+			async for message in ctx.channel.history(limit=limit, before=before, after=after):
+				if not check(message):
+					continue
+				if message.created_at < cutoff:
+					try:
+						await message.delete()
+					except discord.NotFound:
+						continue
+				else:
+					batch.append(message)
+					if len(batch) == 100:
+						await self.delete_batch(ctx.channel, batch)
+				deleted += 1
+			await self.delete_batch(ctx.channel, batch)
+			
+			number = self.bot.cases.add(ctx.guild.id, "Purge", ctx.channel.id, f"#{ctx.channel.name}", ctx.author.id, f"{deleted} messages")
+			await self.send_modlog(ctx, f"Case #{number}: Sucessfully deleted {deleted} of messages\nModerator: {ctx.author.name}")
 			
 	@commands.command()
 	async def kick(self, ctx, member: discord.Member, *, reason):
@@ -54,11 +212,8 @@ class Moderation(commands.Cog):
 		"""
 		if ctx.author.guild_permissions.kick_members:
 			await member.kick(reason=reason)
-			ch = discord.utils.get(ctx.guild.text_channels, name="mod-log")
-			if ch == None:
-				await ctx.send(f"Please setup modlog for the bot\nTo Setup: {ctx.prefix}setup modlog")
-			else:
-				await ch.send(f"Case: Kicked {member.name}\nModerator - {ctx.author.mention}\nReason - {reason}")
+			number = self.record(ctx, "Kick", member, reason)
+			await self.send_modlog(ctx, f"Case #{number}: Kicked {member.name}\nModerator - {ctx.author.mention}\nReason - {reason}")
 			
 	@commands.command()
 	async def ban(self, ctx, member: discord.Member, *, reason):
@@ -67,29 +222,26 @@ class Moderation(commands.Cog):
 		"""
 		if ctx.author.guild_permissions.ban_members:
 			await member.ban(reason=reason)
-			ch = discord.utils.get(ctx.guild.text_channels, name="mod-log")
-			if ch == None:
-				await ctx.send(f"Please setup modlog for the bot\nTo Setup: {ctx.prefix}setup modlog")
-			else:
-				await ch.send(f"Case: Banned {member.name}\nModerator - {ctx.author.mention}\nReason - {reason}")
+			number = self.record(ctx, "Ban", member, reason)
+			await self.send_modlog(ctx, f"Case #{number}: Banned {member.name}\nModerator - {ctx.author.mention}\nReason - {reason}")
 			
 	@commands.command()
-	async def unban(self, ctx, member: discord.Member, *, reason):
+	async def unban(self, ctx, user, *, reason):
 		"""
 		Unban a member
+		
+		The member can be given as an id or as name#discriminator
 		"""
 		if ctx.author.guild_permissions.ban_members:
-			bannedusers = ctx.guild.bans()
-			for bentry in bannedusers:
-				m = bentry.user
+			bans = await self.bans.get(ctx.guild)
+			entry = bans.find(user)
+			if entry is None:
+				return await ctx.send(f"{user} is not banned")
 				
-				if (m.name, m.id) == (member.name, member.id):
-					await ctx.guild.unban(m)
-					ch = discord.utils.get(ctx.guild.text_channels, name="mod-log")
-					if ch == None:
-						await ctx.send(f"Please setup modlog for the bot\nTo Setup: {ctx.prefix}setup modlog")
-					else:
-						await ch.send(f"Case: Unbanned {member.name}\nModerator - {ctx.author.mention}\nReason - {reason}")
+			m = entry.user
+			await ctx.guild.unban(m, reason=reason)
+			number = self.record(ctx, "Unban", m, reason)
+			await self.send_modlog(ctx, f"Case #{number}: Unbanned {m.name}\nModerator - {ctx.author.mention}\nReason - {reason}")
 					
 	@commands.command()
 	async def mute(self, ctx, member: discord.Member, *, reason):
@@ -97,17 +249,16 @@ class Moderation(commands.Cog):
 		Mute the member
 		"""
 		if ctx.author.guild_permissions.kick_members:
-			role = discord.utils.get(ctx.guild.roles, name='Muted')
+			role = self.bot.config.muted_role(ctx.guild)
 			if role == None:
 				role = await ctx.guild.create_role(name="Muted")
-				for channel in ctx.guild.text_channels:
-					await channel.set_permissions(role, send_messages=False)
-			await member.add_roles(role)
-			ch = discord.utils.get(ctx.guild.text_channels, name="mod-log")
-			if ch == None:
-				await ctx.send(f"Please setup modlog for the bot\nTo Setup: {ctx.prefix}setup modlog")
+				self.bot.config.set(ctx.guild.id, muted_role_id=role.id)
+				await member.add_roles(role)
+				await self.provision_muted(ctx, role)
 			else:
-				await ch.send(f"Case: Muted {member.name}\nModerator - {ctx.author.mention}\nReason - {reason}")
+				await member.add_roles(role)
+			number = self.record(ctx, "Mute", member, reason)
+			await self.send_modlog(ctx, f"Case #{number}: Muted {member.name}\nModerator - {ctx.author.mention}\nReason - {reason}")
 			
 	@commands.command()
 	async def unmute(self, ctx, member: discord.Member, *, reason):
@@ -115,14 +266,133 @@ class Moderation(commands.Cog):
 		Unmute a member
 		"""
 		if ctx.author.guild_permissions.kick_members:
-			role = discord.utils.get(ctx.guild.roles, name="Muted")
+			role = self.bot.config.muted_role(ctx.guild)
 			if role in member.roles:
 				await member.remove_roles(role)
-				ch = discord.utils.get(ctx.guild.text_channels, name="mod-log")
-			if ch == None:
-				await ctx.send(f"Please setup modlog for the bot\nTo Setup: {ctx.prefix}setup modlog")
-			else:
-				await ch.send(f"Case: Unmuted {member.name}\nModerator - {ctx.author.mention}\nReason - {reason}")
+				number = self.record(ctx, "Unmute", member, reason)
+				await self.send_modlog(ctx, f"Case #{number}: Unmuted {member.name}\nModerator - {ctx.author.mention}\nReason - {reason}")
+			
+	def mass_targets(self, ctx, args, *, members_only):
+		parser = Arguments(add_help=False, allow_abbrev=False)
+		parser.add_argument("ids", nargs="*", type=int)
+		parser.add_argument("--joined", type=float, help="joined within N minutes")
+		parser.add_argument("--created", type=float, help="account younger than N minutes")
+		parser.add_argument("--regex")
+		parser.add_argument("--reason", nargs="+")
+		# ids and filters may come in any order
+		args = parser.parse_intermixed_args(shlex.split(args))
+		
+		regex = re.compile(args.regex) if args.regex else None
+		now = datetime.datetime.utcnow()
+		targets = {}
+		
+		def allowed(member):
+			if member.id in (ctx.author.id, ctx.guild.me.id, ctx.guild.owner_id):
+				return False
+			return ctx.author.id == ctx.guild.owner_id or member.top_role < ctx.author.top_role
+			
+		for user_id in args.ids:
+			member = ctx.guild.get_member(user_id)
+			if member is None:
+				if not members_only:
+					targets[user_id] = discord.Object(id=user_id)
+			elif allowed(member):
+				targets[user_id] = member
+				
+		if args.joined is not None or args.created is not None or regex is not None:
+			joined = now - datetime.timedelta(minutes=args.joined) if args.joined is not None else None
+			created = now - datetime.timedelta(minutes=args.created) if args.created is not None else None
+			for member in ctx.guild.members:
+				if joined is not None and (member.joined_at is None or member.joined_at < joined):
+					continue
+				if created is not None and member.created_at < created:
+					continue
+				if regex is not None and not regex.search(member.name):
+					continue
+				if allowed(member):
+					targets[member.id] = member
+					
+		reason = " ".join(args.reason) if args.reason else "No reason given"
+		return list(targets.values()), reason
+		
+	async def mass_action(self, ctx, args, *, verb, past, case, action, members_only):
+		try:
+			targets, reason = self.mass_targets(ctx, args, members_only=members_only)
+		except (RuntimeError, ValueError, re.error) as e:
+			return await ctx.send(str(e))
+		if not targets:
+			return await ctx.send("No members matched")
+			
+		msg = await ctx.send(f"{verb} {len(targets)} members...")
+		
+		async def progress(done, total):
+			await msg.edit(content=f"{verb} members... {done}/{total}")
+			
+		full_reason = f"{ctx.author} ({ctx.author.id}): {reason}"
+		succeeded, failed = await self.queue.run(targets, lambda t: action(t, full_reason), progress=progress)
+		await msg.edit(content=f"{past} members\nSucceeded - {len(succeeded)}\nFailed - {len(failed)}")
+		
+		if succeeded:
+			self.bot.cases.add_many(ctx.guild.id, case, [(t.id, str(t) if isinstance(t, discord.Member) else str(t.id)) for t in succeeded], ctx.author.id, reason)
+		names = ", ".join(str(getattr(t, "name", t.id)) for t in succeeded[:30])
+		if len(succeeded) > 30:
+			names += f" and {len(succeeded) - 30} more"
+		await self.send_modlog(ctx, f"Case: {past} {len(succeeded)} members ({len(failed)} failed)\nModerator - {ctx.author.mention}\nReason - {reason}\nMembers - {names or 'None'}")
+		
+	@commands.command()
+	async def massban(self, ctx, *, args):
+		"""
+		Ban many members at once
+		
+		Takes member ids and/or filters:
+		--joined N (joined within N minutes), --created N (account younger than N minutes),
+		--regex PATTERN (name matches), --reason TEXT
+		"""
+		if ctx.author.guild_permissions.ban_members:
+			await self.mass_action(ctx, args, verb="Banning", past="Banned", case="Ban", members_only=False, action=lambda t, reason: ctx.guild.ban(t, reason=reason, delete_message_days=1))
+			
+	@commands.command()
+	async def masskick(self, ctx, *, args):
+		"""
+		Kick many members at once
+		
+		Takes member ids and/or filters:
+		--joined N (joined within N minutes), --created N (account younger than N minutes),
+		--regex PATTERN (name matches), --reason TEXT
+		"""
+		if ctx.author.guild_permissions.kick_members:
+			await self.mass_action(ctx, args, verb="Kicking", past="Kicked", case="Kick", members_only=True, action=lambda t, reason: ctx.guild.kick(t, reason=reason))
+			
+	@commands.command()
+	async def cases(self, ctx, *, member: typing.Union[discord.Member, int]=None):
+		"""
+		Shows the moderation cases of the server or of a member
+		
+		Members who already left or were banned can be looked up by id
+		"""
+		if ctx.author.guild_permissions.kick_members:
+			target_id = member if isinstance(member, int) else getattr(member, "id", None)
+			title = f"Cases of {member}" if member is not None else f"Cases of {ctx.guild.name}"
+			pages = CasePages(ctx, self.bot.cases, target_id=target_id, title=title)
+			if not pages.maximum_pages:
+				return await ctx.send("No cases found")
+			await pages.paginate()
+			
+	@commands.command()
+	async def case(self, ctx, number: int):
+		"""
+		Shows a single moderation case
+		"""
+		if ctx.author.guild_permissions.kick_members:
+			c = self.bot.cases.get(ctx.guild.id, number)
+			if c is None:
+				return await ctx.send(f"Case #{number} doesn't exist")
+			embed = discord.Embed(title=f"Case #{c.number} - {c.action}", color=discord.Color.blurple())
+			embed.add_field(name="Target", value=f"{c.target_name} ({c.target_id})")
+			embed.add_field(name="Moderator", value=f"<@{c.moderator_id}>")
+			embed.add_field(name="Reason", value=c.reason or "No reason", inline=False)
+			embed.set_footer(text=f"{c.created_at[:19].replace('T', ' ')} UTC")
+			await ctx.send(embed=embed)
 			
 def setup(bot):
 	bot.add_cog(Moderation(bot))
\ No newline at end of file
@@ -0,0 +1,69 @@
+import asyncio
+import collections
+import re
+
+BanEntry = collections.namedtuple('BanEntry', 'reason user')
+
+class GuildBans:
+    """The bans of one guild, indexed by user id and ``name#discriminator``."""
+    def __init__(self, entries=()):
+        self.by_id = {}
+        self.by_name = {}
+        for entry in entries:
+            self.add(entry)
+
+    def __len__(self):
+        return len(self.by_id)
+
+    def add(self, entry):
+        self.by_id[entry.user.id] = entry
+        self.by_name[str(entry.user).lower()] = entry.user.id
+
+    def remove(self, user_id):
+        entry = self.by_id.pop(user_id, None)
+        if entry is not None:
+            self.by_name.pop(str(entry.user).lower(), None)
+        return entry
+
+    def find(self, query):
+        """Finds a ban by id, mention or ``name#discriminator``"""
+        match = re.fullmatch(r'<@!?(\d+)>|(\d{15,21})', query.strip())
+        if match:
+            return self.by_id.get(int(match.group(1) or match.group(2)))
+        user_id = self.by_name.get(query.strip().lower())
+        if user_id is not None:
+            return self.by_id.get(user_id)
+        return None
+
+class BanIndex:
+    """Lazily fetched per-guild ban lists kept fresh from ban events"""
+    def __init__(self):
+        self.guilds = {}
+        self._locks = {}
+
+    async def get(self, guild):
+        bans = self.guilds.get(guild.id)
+        if bans is not None:
+            return bans
+
+        lock = self._locks.setdefault(guild.id, asyncio.Lock())
+        async with lock:
+            bans = self.guilds.get(guild.id)
+            if bans is None:
+                entries = await guild.bans()
+                bans = self.guilds[guild.id] = GuildBans(BanEntry(e.reason, e.user) for e in entries)
+        self._locks.pop(guild.id, None)
+        return bans
+
+    def on_ban(self, guild, user, reason=None):
+        bans = self.guilds.get(guild.id)
+        if bans is not None:
+            bans.add(BanEntry(reason, user))
+
+    def on_unban(self, guild, user):
+        bans = self.guilds.get(guild.id)
+        if bans is not None:
+            bans.remove(user.id)
+
+    def forget(self, guild):
+        self.guilds.pop(guild.id, None)
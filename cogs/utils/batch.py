@@ -0,0 +1,88 @@
+import asyncio
+import time
+
+import discord
+
+
+class BatchQueue:
+    """Runs one API call per item with bounded concurrency.
+
+    discord.py waits on the rate limit bucket of every route by itself,
+    so the queue only limits how many calls are in flight (``workers``)
+    and how many are started per second (``rate``), which keeps big
+    batches away from the global rate limit.
+
+    Parameters
+    ------------
+    workers: int
+        How many calls run at the same time.
+    rate: float
+        Maximum number of calls started per second.
+    progress_interval: float
+        Minimum number of seconds between progress callbacks.
+    """
+    def __init__(self, *, workers=5, rate=10.0, progress_interval=2.0):
+        self.workers = workers
+        self.interval = 1.0 / rate
+        self.progress_interval = progress_interval
+        self._lock = asyncio.Lock()
+        self._next = 0.0
+
+    async def pace(self):
+        async with self._lock:
+            now = time.monotonic()
+            if self._next > now:
+                await asyncio.sleep(self._next - now)
+                now = self._next
+            self._next = now + self.interval
+
+    async def run(self, items, action, *, progress=None, done=0, total=None):
+        """Awaits ``action(item)`` for every item.
+
+        ``progress`` is an optional coroutine function called with
+        ``(done, total)`` every now and then and once at the end, ``done``
+        and ``total`` let the caller account for items it skipped itself.
+
+        Returns a ``(succeeded, failed)`` tuple of item lists.
+        """
+        queue = asyncio.Queue()
+        for item in items:
+            queue.put_nowait(item)
+
+        if total is None:
+            total = queue.qsize() + done
+        succeeded = []
+        failed = []
+        last_report = time.monotonic()
+
+        async def report(force=False):
+            nonlocal last_report
+            if progress is None:
+                return
+            now = time.monotonic()
+            if force or now - last_report >= self.progress_interval:
+                last_report = now
+                try:
+                    await progress(done + len(succeeded) + len(failed), total)
+                except discord.HTTPException:
+                    pass
+
+        async def worker():
+            while True:
+                try:
+                    item = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                await self.pace()
+                try:
+                    await action(item)
+                except discord.HTTPException:
+                    failed.append(item)
+                else:
+                    succeeded.append(item)
+                await report()
+
+        if not queue.empty():
+            await asyncio.gather(*(worker() for _ in range(min(self.workers, queue.qsize()))))
+        await report(force=True)
+        return succeeded, failed
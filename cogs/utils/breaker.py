@@ -0,0 +1,145 @@
+import asyncio
+import contextlib
+import math
+import threading
+import time
+
+import aiohttp
+
+from .ratelimit import RateLimited
+
+
+class CircuitOpen(Exception):
+    """Raised instead of calling an upstream that keeps failing"""
+    def __init__(self, host, retry_after):
+        self.host = host
+        self.retry_after = retry_after
+        super().__init__(f'{host} is unavailable right now, try again in {math.ceil(retry_after)} seconds')
+
+class UpstreamFailed(Exception):
+    """Raised when an upstream call errors or runs over its latency budget"""
+    def __init__(self, what, *, timed_out=False):
+        self.what = what
+        self.timed_out = timed_out
+        if timed_out:
+            message = f'Getting {what} took too long, try again later'
+        else:
+            message = f"Couldn't get {what} right now, try again later"
+        super().__init__(message)
+
+BUDGET = 3.0
+
+async def within_budget(aw, what, *, budget=BUDGET, errors=(aiohttp.ClientError, ValueError)):
+    """Awaits an upstream call for at most ``budget`` seconds.
+
+    Running over the budget or raising one of ``errors`` becomes
+    :exc:`UpstreamFailed`. Rate limits and open circuits pass through
+    unchanged as they already carry their own message.
+    """
+    try:
+        return await asyncio.wait_for(aw, timeout=budget)
+    except (asyncio.CancelledError, CircuitOpen, RateLimited):
+        raise
+    except asyncio.TimeoutError as e:
+        raise UpstreamFailed(what, timed_out=True) from e
+    except errors as e:
+        raise UpstreamFailed(what) from e
+
+class CircuitBreaker:
+    """Stops calling an upstream after ``threshold`` failures in a row.
+
+    An open circuit rejects every call for ``reset_timeout`` seconds and
+    then lets a single probe through (half-open). The probe closes the
+    circuit if it succeeds and opens it again if it fails. Should the
+    probe never report back, another one is let through after
+    ``reset_timeout`` seconds.
+    """
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half-open'
+
+    def __init__(self, threshold=5, reset_timeout=30.0):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.retry_at = 0.0
+
+    def retry_after(self, now):
+        """Seconds until the next call is allowed, letting a probe through when it's time"""
+        if self.state == self.CLOSED:
+            return 0.0
+        if now < self.retry_at:
+            return self.retry_at - now
+        self.state = self.HALF_OPEN
+        self.retry_at = now + self.reset_timeout
+        return 0.0
+
+    def success(self):
+        self.state = self.CLOSED
+        self.failures = 0
+
+    def failure(self, now):
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.threshold:
+            self.state = self.OPEN
+            self.retry_at = now + self.reset_timeout
+
+class Breakers:
+    """A circuit breaker per upstream host, created on first use.
+
+    The registry is thread safe, so blocking libraries running in threads
+    can report to it as well.
+
+    Parameters
+    ------------
+    threshold: int
+        How many failures in a row open a circuit.
+    reset_timeout: float
+        How long an open circuit rejects calls before probing again.
+    """
+    def __init__(self, *, threshold=5, reset_timeout=30.0):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.breakers = {}
+        self._lock = threading.Lock()
+
+    def get(self, host):
+        breaker = self.breakers.get(host)
+        if breaker is None:
+            breaker = self.breakers[host] = CircuitBreaker(self.threshold, self.reset_timeout)
+        return breaker
+
+    def check(self, host):
+        with self._lock:
+            retry_after = self.get(host).retry_after(time.monotonic())
+        if retry_after:
+            raise CircuitOpen(host, retry_after)
+
+    def success(self, host):
+        with self._lock:
+            self.get(host).success()
+
+    def failure(self, host):
+        with self._lock:
+            self.get(host).failure(time.monotonic())
+
+    @contextlib.contextmanager
+    def record(self, host):
+        """Records whether the wrapped call raised, the circuit is checked separately"""
+        try:
+            yield
+        except (Exception, asyncio.CancelledError):
+            self.failure(host)
+            raise
+        else:
+            self.success(host)
+
+    def stats(self):
+        """``{host: (state, failures, retry_after)}``"""
+        with self._lock:
+            now = time.monotonic()
+            return {
+                host: (b.state, b.failures, max(0.0, b.retry_at - now) if b.state != b.CLOSED else 0.0)
+                for host, b in self.breakers.items()
+            }
@@ -0,0 +1,84 @@
+import collections
+import datetime
+
+Case = collections.namedtuple('Case', 'number action target_id target_name moderator_id reason created_at')
+
+class CaseStore:
+    """Numbered moderation cases stored in SQLite.
+
+    Cases are numbered per guild and indexed by guild together with the
+    case number, the target and the moderator, so pages can be fetched
+    with ``LIMIT``/``OFFSET`` queries instead of loading the history.
+
+    Parameters
+    ------------
+    db: sqlite3.Connection
+        The bot's database connection.
+    """
+    columns = 'case_number, action, target_id, target_name, moderator_id, reason, created_at'
+
+    def __init__(self, db):
+        self.db = db
+        self.db.executescript(
+            'CREATE TABLE IF NOT EXISTS cases ('
+            'guild_id INTEGER NOT NULL, '
+            'case_number INTEGER NOT NULL, '
+            'action TEXT NOT NULL, '
+            'target_id INTEGER NOT NULL, '
+            'target_name TEXT NOT NULL, '
+            'moderator_id INTEGER NOT NULL, '
+            'reason TEXT, '
+            'created_at TEXT NOT NULL, '
+            'PRIMARY KEY (guild_id, case_number));'
+            'CREATE INDEX IF NOT EXISTS cases_target ON cases (guild_id, target_id, case_number);'
+            'CREATE INDEX IF NOT EXISTS cases_moderator ON cases (guild_id, moderator_id, case_number);'
+        )
+        self.db.commit()
+
+    def add_many(self, guild_id, action, targets, moderator_id, reason):
+        """Records one case per ``(target_id, target_name)`` and returns the first case number"""
+        (last,) = self.db.execute('SELECT COALESCE(MAX(case_number), 0) FROM cases WHERE guild_id = ?', (guild_id,)).fetchone()
+        created_at = datetime.datetime.utcnow().isoformat()
+        self.db.executemany(
+            f'INSERT INTO cases (guild_id, {self.columns}) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+            [(guild_id, last + i, action, target_id, target_name, moderator_id, reason, created_at)
+             for i, (target_id, target_name) in enumerate(targets, 1)]
+        )
+        self.db.commit()
+        return last + 1
+
+    def add(self, guild_id, action, target_id, target_name, moderator_id, reason):
+        return self.add_many(guild_id, action, [(target_id, target_name)], moderator_id, reason)
+
+    @staticmethod
+    def where(target_id, moderator_id):
+        clause = 'guild_id = ?'
+        if target_id is not None:
+            clause += ' AND target_id = ?'
+        if moderator_id is not None:
+            clause += ' AND moderator_id = ?'
+        return clause
+
+    @staticmethod
+    def params(guild_id, target_id, moderator_id):
+        return tuple(p for p in (guild_id, target_id, moderator_id) if p is not None)
+
+    def count(self, guild_id, *, target_id=None, moderator_id=None):
+        query = f'SELECT COUNT(*) FROM cases WHERE {self.where(target_id, moderator_id)}'
+        (count,) = self.db.execute(query, self.params(guild_id, target_id, moderator_id)).fetchone()
+        return count
+
+    def page(self, guild_id, offset, limit, *, target_id=None, moderator_id=None):
+        """Newest cases first"""
+        query = (
+            f'SELECT {self.columns} FROM cases WHERE {self.where(target_id, moderator_id)} '
+            'ORDER BY case_number DESC LIMIT ? OFFSET ?'
+        )
+        rows = self.db.execute(query, (*self.params(guild_id, target_id, moderator_id), limit, offset))
+        return [Case(*row) for row in rows]
+
+    def get(self, guild_id, number):
+        row = self.db.execute(
+            f'SELECT {self.columns} FROM cases WHERE guild_id = ? AND case_number = ?', (guild_id, number)
+        ).fetchone()
+        return Case(*row) if row is not None else None
@@ -0,0 +1,169 @@
+import concurrent.futures
+import sqlite3
+import threading
+
+
+class GuildConfig:
+    """Per-guild settings stored in SQLite and cached in memory.
+
+    Every row is loaded once on startup; reads never touch the database
+    and writes go through to it immediately.
+
+    Parameters
+    ------------
+    db: sqlite3.Connection
+        The bot's database connection.
+    """
+    fields = ('modlog_channel_id', 'muted_role_id')
+
+    def __init__(self, db):
+        self.db = db
+        self.db.execute(
+            'CREATE TABLE IF NOT EXISTS guild_config ('
+            'guild_id INTEGER PRIMARY KEY, '
+            'modlog_channel_id INTEGER, '
+            'muted_role_id INTEGER)'
+        )
+        self.db.commit()
+        self.cache = {}
+        self.scanned = set()
+        for guild_id, *values in self.db.execute(f'SELECT guild_id, {", ".join(self.fields)} FROM guild_config'):
+            self.cache[guild_id] = dict(zip(self.fields, values))
+
+    def get(self, guild_id, field):
+        entry = self.cache.get(guild_id)
+        if entry is None:
+            return None
+        return entry.get(field)
+
+    def set(self, guild_id, **values):
+        for field in values:
+            if field not in self.fields:
+                raise KeyError(f'Unknown config field {field}')
+
+        entry = self.cache.setdefault(guild_id, dict.fromkeys(self.fields))
+        entry.update(values)
+        self.db.execute(
+            f'INSERT OR REPLACE INTO guild_config (guild_id, {", ".join(self.fields)}) '
+            f'VALUES (?, {", ".join("?" for _ in self.fields)})',
+            (guild_id, *(entry[f] for f in self.fields))
+        )
+        self.db.commit()
+
+    def invalidate(self, guild_id, field, value):
+        """Clears ``field`` if it still points at ``value``, e.g. a deleted channel."""
+        if self.get(guild_id, field) == value:
+            self.set(guild_id, **{field: None})
+
+    def modlog(self, guild):
+        channel_id = self.get(guild.id, 'modlog_channel_id')
+        if channel_id is not None:
+            return guild.get_channel(channel_id)
+        if (guild.id, 'modlog_channel_id') in self.scanned:
+            return None
+
+        # guilds set up before the config existed only have the channel name
+        self.scanned.add((guild.id, 'modlog_channel_id'))
+        channel = next((c for c in guild.text_channels if c.name == 'mod-log'), None)
+        if channel is not None:
+            self.set(guild.id, modlog_channel_id=channel.id)
+        return channel
+
+    def muted_role(self, guild):
+        role_id = self.get(guild.id, 'muted_role_id')
+        if role_id is not None:
+            return guild.get_role(role_id)
+        if (guild.id, 'muted_role_id') in self.scanned:
+            return None
+
+        self.scanned.add((guild.id, 'muted_role_id'))
+        role = next((r for r in guild.roles if r.name == 'Muted'), None)
+        if role is not None:
+            self.set(guild.id, muted_role_id=role.id)
+        return role
+
+class PrefixStore:
+    """Per-guild command prefixes.
+
+    All prefixes are loaded into memory on startup so resolving one never
+    touches the disk. Changes apply immediately in memory and are written
+    to SQLite in batches ``delay`` seconds later from a worker thread.
+
+    Parameters
+    ------------
+    db: sqlite3.Connection
+        The bot's database connection, used to create and load the table.
+    path: str
+        The database file, opened separately by the writer thread.
+    default: str
+        The prefix used by guilds that haven't set one.
+    delay: float
+        How long changes are collected before being written.
+    """
+    def __init__(self, db, path, *, loop, default='c;', delay=5.0):
+        self.path = path
+        self.loop = loop
+        self.default = default
+        self.delay = delay
+        db.execute('CREATE TABLE IF NOT EXISTS guild_prefix (guild_id INTEGER PRIMARY KEY, prefix TEXT NOT NULL)')
+        db.commit()
+        self.prefixes = dict(db.execute('SELECT guild_id, prefix FROM guild_prefix'))
+        self.dirty = {}
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        self._local = threading.local()
+        self._handle = None
+        self.closed = False
+
+    def get(self, guild_id):
+        return self.prefixes.get(guild_id, self.default)
+
+    def set(self, guild_id, prefix):
+        if prefix is None or prefix == self.default:
+            self.prefixes.pop(guild_id, None)
+            prefix = None
+        else:
+            self.prefixes[guild_id] = prefix
+        self.dirty[guild_id] = prefix
+        if self._handle is None:
+            self._handle = self.loop.call_later(self.delay, self._schedule_flush)
+
+    def _schedule_flush(self):
+        self._handle = None
+        self.loop.create_task(self.flush())
+
+    def _write(self, batch):
+        # the connection lives in the single writer thread
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = self._local.db = sqlite3.connect(self.path)
+        db.executemany(
+            'INSERT OR REPLACE INTO guild_prefix (guild_id, prefix) VALUES (?, ?)',
+            [(guild_id, prefix) for guild_id, prefix in batch.items() if prefix is not None]
+        )
+        db.executemany(
+            'DELETE FROM guild_prefix WHERE guild_id = ?',
+            [(guild_id,) for guild_id, prefix in batch.items() if prefix is None]
+        )
+        db.commit()
+
+    async def flush(self):
+        if not self.dirty:
+            return
+        batch, self.dirty = self.dirty, {}
+        await self.loop.run_in_executor(self.executor, self._write, batch)
+
+    def _close_db(self):
+        db = getattr(self._local, 'db', None)
+        if db is not None:
+            db.close()
+
+    async def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        await self.flush()
+        await self.loop.run_in_executor(self.executor, self._close_db)
+        self.executor.shutdown(wait=True)
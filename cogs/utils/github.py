@@ -0,0 +1,148 @@
+import asyncio
+import collections
+import json
+import os
+import time
+
+import aiohttp
+
+from .breaker import CircuitOpen
+from .ratelimit import RateLimited
+
+
+class GitHubError(Exception):
+    pass
+
+class GitHubClient:
+    """A small GitHub API client built on top of the bot's web client.
+
+    Responses are cached together with their ``ETag``/``Last-Modified``
+    headers so repeated lookups are sent as conditional requests, which
+    GitHub does not count against the rate limit. When the rate limit is
+    exhausted (or nearly so) cached data is served instead, even if stale.
+    The cache is persisted to ``cache_file`` so restarts don't start cold.
+
+    Parameters
+    ------------
+    web: WebClient
+        The shared web client.
+    cache_file: str
+        Where the cache is stored on disk.
+    max_entries: int
+        How many responses to keep, least recently used are dropped first.
+    reserve: int
+        When this many requests or fewer are left, cached entries are
+        served without asking GitHub.
+    """
+    BASE = 'https://api.github.com'
+
+    def __init__(self, web, *, cache_file='github_cache.json', max_entries=500, reserve=5):
+        self.web = web
+        self.cache_file = cache_file
+        self.max_entries = max_entries
+        self.reserve = reserve
+        self.token = os.getenv('GITHUB_TOKEN')
+        self.cache = collections.OrderedDict()
+        self.remaining = None
+        self.reset = 0.0
+        self._save_lock = asyncio.Lock()
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.cache_file) as fp:
+                data = json.load(fp)
+        except (OSError, ValueError):
+            return
+        self.cache.update(data.get('entries', {}))
+        self.remaining = data.get('remaining')
+        self.reset = data.get('reset', 0.0)
+
+    def _write(self, data):
+        tmp = f'{self.cache_file}.tmp'
+        with open(tmp, 'w') as fp:
+            json.dump(data, fp)
+        os.replace(tmp, self.cache_file)
+
+    async def save(self):
+        data = {'entries': dict(self.cache), 'remaining': self.remaining, 'reset': self.reset}
+        async with self._save_lock:
+            await asyncio.get_event_loop().run_in_executor(None, self._write, data)
+
+    @property
+    def rate_limited(self):
+        return self.remaining is not None and self.remaining <= 0 and time.time() < self.reset
+
+    def update_rate_limit(self, headers):
+        remaining = headers.get('X-RateLimit-Remaining')
+        reset = headers.get('X-RateLimit-Reset')
+        if remaining is not None:
+            self.remaining = int(remaining)
+        if reset is not None:
+            self.reset = float(reset)
+
+    def store(self, path, data, headers):
+        self.cache[path] = {
+            'data': data,
+            'etag': headers.get('ETag'),
+            'last_modified': headers.get('Last-Modified'),
+            'fetched': time.time()
+        }
+        self.cache.move_to_end(path)
+        while len(self.cache) > self.max_entries:
+            self.cache.popitem(last=False)
+
+    def cached(self, path):
+        entry = self.cache.get(path)
+        if entry is not None:
+            self.cache.move_to_end(path)
+            return entry['data']
+
+    async def get(self, path, guild_id=None):
+        entry = self.cache.get(path)
+        low = self.remaining is not None and self.remaining <= self.reserve and time.time() < self.reset
+        if entry is not None and low:
+            return self.cached(path)
+
+        if self.rate_limited:
+            raise GitHubError(f'GitHub rate limit reached, try again in {int(self.reset - time.time())} seconds')
+
+        headers = {'Accept': 'application/vnd.github.v3+json'}
+        if self.token:
+            headers['Authorization'] = f'token {self.token}'
+        if entry is not None:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+
+        try:
+            async with self.web.get(f'{self.BASE}{path}', headers=headers, guild_id=guild_id) as resp:
+                self.update_rate_limit(resp.headers)
+                if resp.status == 304:
+                    return self.cached(path)
+                if resp.status == 404:
+                    raise GitHubError('Not found on GitHub')
+                if resp.status >= 400:
+                    if entry is not None:
+                        return self.cached(path)
+                    raise GitHubError(f'GitHub responded with {resp.status}')
+                data = await resp.json()
+                self.store(path, data, resp.headers)
+        except (RateLimited, CircuitOpen):
+            if entry is not None:
+                return self.cached(path)
+            raise
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            if entry is not None:
+                return self.cached(path)
+            raise GitHubError('Could not reach GitHub')
+
+        await self.save()
+        return data
+
+    async def user(self, username, guild_id=None):
+        return await self.get(f'/users/{username}', guild_id)
+
+    async def repo(self, owner, name, guild_id=None):
+        return await self.get(f'/repos/{owner}/{name}', guild_id)
@@ -0,0 +1,235 @@
+import collections
+import itertools
+import re
+import time
+
+import discord
+from discord.ext import commands
+
+HelpEntry = collections.namedtuple('HelpEntry', 'command name signature doc')
+
+def cog_key(command):
+    return command.cog_name or '\u200bNo Category'
+
+def words(text):
+    return re.findall(r'[a-z0-9]+', text.lower())
+
+def allowed_typos(word):
+    """How many typos a word may have and still match"""
+    if len(word) < 3:
+        return 0
+    return 1 if len(word) < 6 else 2
+
+def distance(a, b):
+    """The Damerau-Levenshtein distance between two strings.
+
+    Swapped letters count as one edit, even when other edits touch them,
+    which keeps this a true metric as the BK-trees need.
+    """
+    far = len(a) + len(b)
+    # d[i + 1][j + 1] is the distance between a[:i] and b[:j]
+    d = [[far] * (len(b) + 2) for _ in range(len(a) + 2)]
+    for i in range(len(a) + 1):
+        d[i + 1][1] = i
+    for j in range(len(b) + 1):
+        d[1][j + 1] = j
+
+    last_row = {}
+    for i in range(1, len(a) + 1):
+        last_col = 0
+        for j in range(1, len(b) + 1):
+            k = last_row.get(b[j - 1], 0)
+            l = last_col
+            if a[i - 1] == b[j - 1]:
+                cost = 0
+                last_col = j
+            else:
+                cost = 1
+            d[i + 1][j + 1] = min(
+                d[i][j] + cost,
+                d[i + 1][j] + 1,
+                d[i][j + 1] + 1,
+                d[k][l] + (i - k - 1) + 1 + (j - l - 1)
+            )
+        last_row[a[i - 1]] = i
+    return d[len(a) + 1][len(b) + 1]
+
+class BKTree:
+    """A Burkhard-Keller tree for finding words within an edit distance.
+
+    Only the subtrees whose edge distance could still hold a match are
+    visited, so a lookup compares against a handful of words rather than
+    all of them.
+    """
+    def __init__(self, items=()):
+        self.root = None
+        for word in items:
+            self.add(word)
+
+    def add(self, word):
+        if self.root is None:
+            self.root = (word, {})
+            return
+
+        node = self.root
+        while True:
+            d = distance(word, node[0])
+            if d == 0:
+                return
+            child = node[1].get(d)
+            if child is None:
+                node[1][d] = (word, {})
+                return
+            node = child
+
+    def search(self, word, max_distance):
+        """``(distance, word)`` pairs within ``max_distance``, closest first"""
+        if self.root is None:
+            return []
+
+        found = []
+        stack = [self.root]
+        while stack:
+            candidate, children = stack.pop()
+            d = distance(word, candidate)
+            if d <= max_distance:
+                found.append((d, candidate))
+            for k in range(max(d - max_distance, 1), d + max_distance + 1):
+                child = children.get(k)
+                if child is not None:
+                    stack.append(child)
+        return sorted(found)
+
+SearchIndex = collections.namedtuple('SearchIndex', 'postings vocabulary names name_tree')
+
+class HelpIndex:
+    """Pre-rendered help pages and cached check results.
+
+    The index is built the first time help is asked for and thrown away
+    whenever extensions are loaded or unloaded. Searching goes through an
+    inverted index of command names, aliases and help text, with BK-trees
+    over its words and the command names to tolerate typos. Whether a user passes a
+    command's checks is remembered per guild and user for ``check_ttl``
+    seconds, so repeated help calls don't run every check again.
+    """
+    def __init__(self, bot, *, check_ttl=30.0, max_users=1000):
+        self.bot = bot
+        self.check_ttl = check_ttl
+        self.max_users = max_users
+        self._cogs = None
+        self._search = None
+        self._entries = {}
+        self._checks = {}
+
+    def invalidate(self):
+        self._cogs = None
+        self._search = None
+        self._entries.clear()
+        self._checks.clear()
+
+    def entry(self, command):
+        entry = self._entries.get(command.qualified_name)
+        if entry is None or entry.command is not command:
+            entry = HelpEntry(
+                command,
+                command.name,
+                f'{command.qualified_name} {command.signature}',
+                command.short_doc or 'No help given'
+            )
+            self._entries[command.qualified_name] = entry
+        return entry
+
+    @property
+    def cogs(self):
+        """``(cog name, description, entries)`` for every cog with visible commands"""
+        if self._cogs is None:
+            visible = sorted((c for c in self.bot.commands if not c.hidden), key=cog_key)
+            self._cogs = []
+            for cog, cmds in itertools.groupby(visible, key=cog_key):
+                entries = sorted((self.entry(c) for c in cmds), key=lambda e: e.name)
+                actual_cog = self.bot.get_cog(cog)
+                # get the description if it exists (and the cog is valid) or return Empty embed.
+                description = (actual_cog and actual_cog.description) or discord.Embed.Empty
+                self._cogs.append((cog, description, entries))
+        return self._cogs
+
+    @property
+    def search_index(self):
+        if self._search is None:
+            # token -> {qualified name: weight}
+            postings = collections.defaultdict(dict)
+            names = {}
+            for command in self.bot.walk_commands():
+                if command.hidden:
+                    continue
+
+                entry = self.entry(command)
+                tokens = [(command.name, 3)]
+                tokens.extend((alias, 2) for alias in command.aliases)
+                tokens.extend((word, 1) for word in words(command.help or '') if len(word) > 2)
+                for text, weight in tokens:
+                    for token in words(text):
+                        hits = postings[token]
+                        hits[entry.command.qualified_name] = max(hits.get(entry.command.qualified_name, 0), weight)
+
+                if command.parent is None:
+                    for name in (command.name, *command.aliases):
+                        names[name.lower()] = entry
+
+            self._search = SearchIndex(dict(postings), BKTree(postings), names, BKTree(names))
+        return self._search
+
+    def search(self, query):
+        """Entries matching ``query``, best match first"""
+        index = self.search_index
+        scores = collections.Counter()
+        for term in words(query):
+            if term in index.postings:
+                matches = [(0, term)]
+            else:
+                matches = index.vocabulary.search(term, allowed_typos(term))
+            for d, token in matches:
+                for name, weight in index.postings[token].items():
+                    scores[name] += weight / (1 + d)
+        return [self._entries[name] for name, _ in scores.most_common()]
+
+    def suggest(self, name):
+        """The top level commands closest to a mistyped ``name``"""
+        index = self.search_index
+        name = name.lower()
+        matches = index.name_tree.search(name, allowed_typos(name))
+        if not matches:
+            return []
+
+        best = matches[0][0]
+        entries = []
+        for d, match in matches:
+            entry = index.names[match]
+            if d == best and entry not in entries:
+                entries.append(entry)
+        return entries
+
+    def checks_for(self, ctx):
+        key = (ctx.guild and ctx.guild.id, ctx.author.id)
+        now = time.monotonic()
+        cached = self._checks.get(key)
+        if cached is None or cached[0] <= now:
+            if len(self._checks) >= self.max_users:
+                self._checks = {k: v for k, v in self._checks.items() if v[0] > now}
+            cached = self._checks[key] = (now + self.check_ttl, {})
+        return cached[1]
+
+    async def can_run(self, ctx, command):
+        results = self.checks_for(ctx)
+        allowed = results.get(command.qualified_name)
+        if allowed is None:
+            try:
+                allowed = await command.can_run(ctx)
+            except commands.CommandError:
+                allowed = False
+            results[command.qualified_name] = allowed
+        return allowed
+
+    async def filter(self, ctx, entries):
+        """Keeps the entries whose command ``ctx.author`` can run"""
+        return [e for e in entries if not e.command.hidden and await self.can_run(ctx, e.command)]
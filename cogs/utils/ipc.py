@@ -0,0 +1,123 @@
+import asyncio
+import inspect
+import itertools
+import json
+
+
+class ClusterIPC:
+    """Talks to the launcher over its Unix socket.
+
+    Every cluster registers ``handlers`` that return JSON-serialisable
+    data about the shards it owns. :meth:`gather` runs a handler on every
+    cluster and returns the list of results. When the bot isn't running
+    under the launcher only the local handler is called.
+
+    Parameters
+    ------------
+    path: Optional[str]
+        The launcher's socket path, ``None`` when running standalone.
+    cluster_id: int
+        The id of this cluster.
+    timeout: float
+        How long to wait for the other clusters to answer.
+    """
+    def __init__(self, bot, *, path=None, cluster_id=0, timeout=5.0):
+        self.bot = bot
+        self.path = path
+        self.cluster_id = cluster_id
+        self.timeout = timeout
+        self.handlers = {}
+        self.pending = {}
+        self.writer = None
+        self._nonce = itertools.count()
+        self._lock = asyncio.Lock()
+        self._task = None
+
+    @property
+    def connected(self):
+        return self.writer is not None and not self.writer.transport.is_closing()
+
+    def start(self):
+        if self.path and self._task is None:
+            self._task = self.bot.loop.create_task(self.run())
+
+    async def run(self):
+        while not self.bot.is_closed():
+            try:
+                reader, writer = await asyncio.open_unix_connection(self.path)
+            except OSError:
+                await asyncio.sleep(5.0)
+                continue
+
+            self.writer = writer
+            try:
+                await self.send({'op': 'identify', 'cluster': self.cluster_id})
+                await self.listen(reader)
+            except (OSError, ValueError) as e:
+                print(f'[IPC] {e}')
+            finally:
+                self.writer = None
+                for future in self.pending.values():
+                    if not future.done():
+                        future.set_exception(ConnectionResetError('IPC connection lost'))
+                self.pending.clear()
+            await asyncio.sleep(1.0)
+
+    async def listen(self, reader):
+        while True:
+            line = await reader.readline()
+            if not line:
+                return
+            msg = json.loads(line)
+            op = msg.get('op')
+            if op == 'command':
+                self.bot.loop.create_task(self.respond(msg))
+            elif op == 'result':
+                future = self.pending.pop(msg['nonce'], None)
+                if future is not None and not future.done():
+                    future.set_result(msg['data'])
+
+    async def send(self, msg):
+        async with self._lock:
+            self.writer.write(json.dumps(msg).encode('utf-8') + b'\n')
+            await self.writer.drain()
+
+    async def call_local(self, name, args):
+        handler = self.handlers.get(name)
+        if handler is None:
+            return None
+        result = handler(**args)
+        if inspect.isawaitable(result):
+            result = await result
+        return result
+
+    async def respond(self, msg):
+        try:
+            data = await self.call_local(msg['name'], msg.get('args', {}))
+        except Exception as e:
+            print(f'[IPC] handler {msg["name"]} failed: {e}')
+            data = None
+        if self.connected:
+            await self.send({'op': 'reply', 'nonce': msg['nonce'], 'cluster': self.cluster_id, 'data': data})
+
+    async def gather(self, name, **args):
+        """Runs the ``name`` handler on every cluster and returns the results."""
+        if self.connected:
+            nonce = f'{self.cluster_id}:{next(self._nonce)}'
+            future = self.pending[nonce] = self.bot.loop.create_future()
+            try:
+                await self.send({'op': 'gather', 'nonce': nonce, 'name': name, 'args': args})
+                results = await asyncio.wait_for(future, self.timeout + 1.0)
+            except (OSError, asyncio.TimeoutError):
+                self.pending.pop(nonce, None)
+            else:
+                return [r for r in results if r is not None]
+
+        local = await self.call_local(name, args)
+        return [] if local is None else [local]
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+        if self.writer is not None:
+            self.writer.close()
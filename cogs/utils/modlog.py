@@ -0,0 +1,110 @@
+import asyncio
+
+import discord
+
+
+class ModlogWriter:
+    """Queues mod-log entries and posts them in coalesced batches.
+
+    Every mod-log channel gets its own queue and writer task. Entries
+    arriving within ``window`` seconds of the first one are joined into
+    a single embed, split only when it would go over the embed limits.
+    When a queue holds ``maxsize`` entries :meth:`put` waits for room.
+
+    Parameters
+    ------------
+    window: float
+        How long to wait for more entries before posting.
+    maxsize: int
+        Maximum number of entries waiting per channel.
+    """
+    DESCRIPTION_LIMIT = 2048
+
+    def __init__(self, *, loop, window=2.0, maxsize=100):
+        self.loop = loop
+        self.window = window
+        self.maxsize = maxsize
+        self.queues = {}
+        self.tasks = {}
+
+    async def put(self, channel, entry):
+        queue = self.queues.get(channel.id)
+        if queue is None:
+            queue = self.queues[channel.id] = asyncio.Queue(maxsize=self.maxsize)
+            self.tasks[channel.id] = self.loop.create_task(self.writer(channel, queue))
+        await queue.put(entry)
+
+    def pages(self, entries):
+        page = []
+        size = 0
+        for entry in entries:
+            entry = entry[:self.DESCRIPTION_LIMIT]
+            if page and size + len(entry) + 2 > self.DESCRIPTION_LIMIT:
+                yield page
+                page = []
+                size = 0
+            page.append(entry)
+            size += len(entry) + 2
+        if page:
+            yield page
+
+    async def send(self, channel, entries):
+        if len(entries) == 1:
+            await channel.send(entries[0])
+            return
+
+        for page in self.pages(entries):
+            embed = discord.Embed(color=discord.Color.blurple(), description='\n\n'.join(page))
+            embed.set_footer(text=f'{len(page)} entries')
+            await channel.send(embed=embed)
+
+    async def writer(self, channel, queue):
+        try:
+            closing = False
+            while not closing:
+                entry = await queue.get()
+                if entry is None:
+                    break
+
+                entries = [entry]
+                deadline = self.loop.time() + self.window
+                while True:
+                    timeout = deadline - self.loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        entry = await asyncio.wait_for(queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                    if entry is None:
+                        closing = True
+                        break
+                    entries.append(entry)
+
+                try:
+                    await self.send(channel, entries)
+                except asyncio.CancelledError:
+                    # an Exception on Python 3.7, close() has to be able to stop us
+                    raise
+                except Exception as e:
+                    # connection errors and timeouts must not kill the writer
+                    print(f'[Modlog] {channel.id}: {e}')
+        finally:
+            # the next put starts a fresh writer instead of filling a dead queue
+            if self.queues.get(channel.id) is queue:
+                del self.queues[channel.id]
+                del self.tasks[channel.id]
+
+    async def close(self, *, timeout=10.0):
+        """Flushes every queue and stops the writers"""
+        tasks = list(self.tasks.values())
+        for queue in list(self.queues.values()):
+            try:
+                queue.put_nowait(None)
+            except asyncio.QueueFull:
+                # the writer stops once the wait below times out
+                pass
+        if tasks:
+            await asyncio.wait(tasks, timeout=timeout)
+            for task in tasks:
+                task.cancel()
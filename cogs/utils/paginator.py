@@ -1,4 +1,8 @@
 import asyncio
+import collections
+import inspect
+import math
+import tempfile
 
 import discord
 from discord.ext.commands import Paginator as CommandPaginator
@@ -7,6 +11,312 @@ from discord.ext.commands import Paginator as CommandPaginator
 class CannotPaginate(Exception):
     pass
 
+class PageSource:
+    """Base class for where a paginator gets its pages from.
+
+    Attributes
+    -----------
+    maximum_pages: Optional[int]
+        How many pages there are, ``None`` if it isn't known yet.
+    total: Optional[int]
+        How many entries there are, ``None`` if it isn't known.
+    """
+    maximum_pages = None
+    total = None
+
+    async def get_page(self, page):
+        """Returns the entries of ``page`` or an empty list if there is no such page."""
+        raise NotImplementedError
+
+class ListPageSource(PageSource):
+    """Pages over a list that is already in memory."""
+    def __init__(self, entries, per_page):
+        self.entries = entries
+        self.per_page = per_page
+        self.total = len(entries)
+        pages, left_over = divmod(self.total, per_page)
+        if left_over:
+            pages += 1
+        self.maximum_pages = pages
+
+    async def get_page(self, page):
+        base = (page - 1) * self.per_page
+        return self.entries[base:base + self.per_page]
+
+class CallablePageSource(PageSource):
+    """Calls ``fetch_page(page)`` whenever a page is needed.
+
+    ``fetch_page`` can be a regular function or a coroutine function.
+    """
+    def __init__(self, fetch_page, *, maximum_pages=None, total=None):
+        self.fetch_page = fetch_page
+        self.maximum_pages = maximum_pages
+        self.total = total
+
+    async def get_page(self, page):
+        entries = self.fetch_page(page)
+        if inspect.isawaitable(entries):
+            entries = await entries
+        return entries or []
+
+class AsyncIteratorPageSource(PageSource):
+    """Pulls entries from an async iterator only as far as the pages shown.
+
+    Entries that were already pulled are kept so going back still works.
+    """
+    def __init__(self, iterator, per_page):
+        self.iterator = iterator.__aiter__()
+        self.per_page = per_page
+        self.entries = []
+        self.exhausted = False
+
+    async def get_page(self, page):
+        end = page * self.per_page
+        while not self.exhausted and len(self.entries) < end:
+            try:
+                self.entries.append(await self.iterator.__anext__())
+            except StopAsyncIteration:
+                self.exhausted = True
+                self.total = len(self.entries)
+                pages, left_over = divmod(self.total, self.per_page)
+                self.maximum_pages = pages + bool(left_over)
+        return self.entries[end - self.per_page:end]
+
+class TextPageSource(PageSource):
+    """Builds pages of text one at a time from a line iterable.
+
+    ``lines`` can be any iterable of strings, including generators and
+    open files. Pages are only built as far as they are asked for, one
+    page ahead so the paginator knows early whether there is more. Only
+    ``resident`` pages are kept in memory, older ones are spilled to a
+    temporary file and read back when navigating to them again.
+    """
+    def __init__(self, lines, *, prefix='```', suffix='```', max_size=1800, resident=10):
+        self.lines = iter(lines)
+        self.prefix = prefix
+        self.suffix = suffix
+        # room for the prefix and suffix lines
+        self.budget = max_size - len(prefix) - len(suffix) - 2
+        self.resident = resident
+        self.built = 0
+        self.exhausted = False
+        self.pending = None
+        self.pages = collections.OrderedDict()
+        self.spilled = {}
+        self.spill = None
+        self.build_until(2)
+
+    def next_line(self):
+        if self.pending is not None:
+            line, self.pending = self.pending, None
+            return line
+        try:
+            line = next(self.lines)
+        except StopIteration:
+            return None
+        return line.rstrip('\r\n')
+
+    def build_page(self):
+        lines = []
+        size = 0
+        while True:
+            line = self.next_line()
+            if line is None:
+                break
+            if len(line) > self.budget:
+                # a line that doesn't fit on any page gets split
+                self.pending = line[self.budget:]
+                line = line[:self.budget]
+            if lines and size + len(line) + 1 > self.budget:
+                self.pending = line if self.pending is None else line + self.pending
+                break
+            lines.append(line)
+            size += len(line) + 1
+
+        if not lines:
+            self.exhausted = True
+            self.maximum_pages = self.built
+            return False
+
+        self.built += 1
+        self.store(self.built, '\n'.join((self.prefix, *lines, self.suffix)))
+        return True
+
+    def build_until(self, page):
+        while not self.exhausted and self.built < page:
+            self.build_page()
+
+    def store(self, page, text):
+        self.pages[page] = text
+        self.pages.move_to_end(page)
+        while len(self.pages) > self.resident:
+            old, old_text = self.pages.popitem(last=False)
+            if old not in self.spilled:
+                if self.spill is None:
+                    self.spill = tempfile.TemporaryFile()
+                data = old_text.encode('utf-8')
+                self.spill.seek(0, 2)
+                self.spilled[old] = (self.spill.tell(), len(data))
+                self.spill.write(data)
+
+    def load(self, page):
+        text = self.pages.get(page)
+        if text is not None:
+            self.pages.move_to_end(page)
+            return text
+        offset, length = self.spilled[page]
+        self.spill.seek(offset)
+        text = self.spill.read(length).decode('utf-8')
+        self.store(page, text)
+        return text
+
+    async def get_page(self, page):
+        # stay a page ahead so we find out about the end early
+        self.build_until(page + 1)
+        if page > self.built:
+            return []
+        return [self.load(page)]
+
+    def close(self):
+        if self.spill is not None:
+            self.spill.close()
+            self.spill = None
+
+def as_page_source(source, per_page):
+    if isinstance(source, PageSource):
+        return source
+    if hasattr(source, '__aiter__'):
+        return AsyncIteratorPageSource(source, per_page)
+    if callable(source):
+        return CallablePageSource(source)
+    return ListPageSource(source, per_page)
+
+class PaginatorRouter:
+    """Routes reactions to the paginator session that owns the message.
+
+    A single raw reaction listener looks the session up by message id
+    instead of every session waiting on its own ``reaction_add`` check.
+    Idle sessions are expired by a timing wheel ticking once a second and
+    when more than ``max_sessions`` are open the oldest one is closed.
+    Background tasks started by a session are cancelled with it.
+
+    Parameters
+    ------------
+    max_sessions: int
+        How many sessions can be open at once.
+    timeout: float
+        How many seconds a session stays open without reactions.
+    slots: int
+        Number of one second slots in the timing wheel.
+    """
+    def __init__(self, bot, *, max_sessions=200, timeout=60.0, slots=64):
+        self.bot = bot
+        self.max_sessions = max_sessions
+        self.timeout = timeout
+        self.sessions = collections.OrderedDict()
+        self.deadlines = {}
+        self.slots = {}
+        self.wheel = [set() for _ in range(slots)]
+        self.tasks = collections.defaultdict(set)
+        self.locks = {}
+        self._tick = None
+        self._ticker = None
+        bot.add_listener(self.on_raw_reaction_add, 'on_raw_reaction_add')
+
+    def touch(self, message_id):
+        slot = self.slots.pop(message_id, None)
+        if slot is not None:
+            self.wheel[slot].discard(message_id)
+        deadline = self.bot.loop.time() + self.timeout
+        # a slot holds deadlines up to its second, so it is due once that second starts
+        slot = math.ceil(deadline) % len(self.wheel)
+        self.deadlines[message_id] = deadline
+        self.slots[message_id] = slot
+        self.wheel[slot].add(message_id)
+
+    def open(self, session):
+        message_id = session.message.id
+        self.sessions[message_id] = session
+        self.locks[message_id] = asyncio.Lock()
+        self.touch(message_id)
+        while len(self.sessions) > self.max_sessions:
+            self.expire(next(iter(self.sessions)))
+
+        if self._ticker is None or self._ticker.done():
+            self._ticker = self.bot.loop.create_task(self.tick())
+
+    def expire(self, message_id):
+        session = self.sessions.get(message_id)
+        self.forget(message_id)
+        if session is not None:
+            self.bot.loop.create_task(self.close(session, expired=True))
+
+    def track(self, session, coro):
+        """Runs ``coro`` in the background until ``session`` closes"""
+        task = self.bot.loop.create_task(coro)
+        tasks = self.tasks[session.message.id]
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+        return task
+
+    def forget(self, message_id):
+        self.sessions.pop(message_id, None)
+        self.deadlines.pop(message_id, None)
+        self.locks.pop(message_id, None)
+        slot = self.slots.pop(message_id, None)
+        if slot is not None:
+            self.wheel[slot].discard(message_id)
+        for task in self.tasks.pop(message_id, ()):
+            task.cancel()
+
+    async def close(self, session, *, expired=False):
+        self.forget(session.message.id)
+        if session.paginating:
+            session.paginating = False
+            if expired:
+                await session.expire()
+        session.closed.set()
+        close = getattr(session.source, 'close', None)
+        if close is not None:
+            close()
+
+    async def tick(self):
+        loop = self.bot.loop
+        self._tick = int(loop.time())
+        while self.sessions:
+            await asyncio.sleep(1.0)
+            now = loop.time()
+            for tick in range(self._tick, int(now) + 1):
+                for message_id in list(self.wheel[tick % len(self.wheel)]):
+                    # entries a full turn of the wheel away stay where they are
+                    if self.deadlines.get(message_id, 0) <= now:
+                        self.expire(message_id)
+            self._tick = int(now) + 1
+
+    async def on_raw_reaction_add(self, payload):
+        session = self.sessions.get(payload.message_id)
+        if session is None or payload.user_id != session.author.id:
+            return
+
+        func = session.reaction_for(str(payload.emoji))
+        if func is None:
+            return
+
+        self.touch(payload.message_id)
+        self.track(session, self.dispatch(session, func, payload))
+
+    async def dispatch(self, session, func, payload):
+        try:
+            await session.message.remove_reaction(payload.emoji, discord.Object(id=payload.user_id))
+        except discord.HTTPException:
+            pass # can't remove it so don't bother doing so
+
+        lock = self.locks.get(payload.message_id)
+        if lock is None:
+            return
+        async with lock:
+            await func()
+
 class Pages:
     """Implements a paginator that queries the user for the
     pagination interface.
@@ -19,6 +329,9 @@ class Pages:
         The context of the command.
     entries: List[str]
         A list of entries to paginate.
+    source: Union[PageSource, AsyncIterator, Callable[[int], List]]
+        Where to get pages from when they shouldn't be loaded up front,
+        used instead of ``entries``. Callables are given the page number.
     per_page: int
         How many entries show up per page.
     show_entry_count: bool
@@ -32,9 +345,10 @@ class Pages:
     permissions: discord.Permissions
         Our permissions for the channel.
     """
-    def __init__(self, ctx, *, entries, per_page=12, show_entry_count=True, title=None, embed_color = discord.Color.dark_magenta(), nocount=False, delete_after=True):
+    def __init__(self, ctx, *, entries=None, source=None, per_page=12, show_entry_count=True, title=None, embed_color = discord.Color.dark_magenta(), nocount=False, delete_after=True, cache_size=5):
         self.bot = ctx.bot
         self.delete_after = delete_after
+        self.source = as_page_source(source if source is not None else entries, per_page)
         self.entries = entries
         self.message = ctx.message
         self.channel = ctx.channel
@@ -42,12 +356,12 @@ class Pages:
         self.nocount = nocount
         self.title = title
         self.per_page = per_page
-        pages, left_over = divmod(len(self.entries), self.per_page)
-        if left_over:
-            pages += 1
-        self.maximum_pages = pages
         self.embed = discord.Embed(colour=embed_color)
-        self.paginating = len(entries) > per_page
+        # an unknown page count means we can't tell if there is a second page
+        self.paginating = self.maximum_pages is None or self.maximum_pages > 1
+        self.cache_size = cache_size
+        self._rendered = collections.OrderedDict()
+        self._prefetched = {}
         self.show_entry_count = show_entry_count
         self.reaction_emojis = [
             ('\N{BLACK LEFT-POINTING DOUBLE TRIANGLE WITH VERTICAL BAR}', self.first_page),
@@ -76,9 +390,28 @@ class Pages:
             if not self.permissions.read_message_history:
                 raise CannotPaginate('Bot does not have Read Message History permission.')
 
+    @property
+    def maximum_pages(self):
+        return self.source.maximum_pages
+
+    @maximum_pages.setter
+    def maximum_pages(self, value):
+        self.source.maximum_pages = value
+
+    @property
+    def page_count_text(self):
+        return '?' if self.maximum_pages is None else self.maximum_pages
+
     def get_page(self, page):
-        base = (page - 1) * self.per_page
-        return self.entries[base:base + self.per_page]
+        return self.source.get_page(page)
+
+    async def fetch_page(self, page):
+        if page in self._prefetched:
+            return self._prefetched.pop(page)
+        entries = self.get_page(page)
+        if inspect.isawaitable(entries):
+            entries = await entries
+        return entries
 
     def get_content(self, entries, page, *, first=False):
         return None
@@ -95,11 +428,11 @@ class Pages:
             else:
                 p.append(f'{index}. {entry}')
 
-        if self.maximum_pages > 1:
-            if self.show_entry_count:
-                text = f'Page {page}/{self.maximum_pages} ({len(self.entries)} entries)'
+        if self.paginating:
+            if self.show_entry_count and self.source.total is not None:
+                text = f'Page {page}/{self.page_count_text} ({self.source.total} entries)'
             else:
-                text = f'Page {page}/{self.maximum_pages}'
+                text = f'Page {page}/{self.page_count_text}'
 
             self.embed.set_footer(text=text)
 
@@ -109,11 +442,24 @@ class Pages:
         self.embed.description = '\n'.join(p)
         self.embed.title = self.title or discord.Embed.Empty
 
-    async def show_page(self, page, *, first=False):
-        self.current_page = page
-        entries = self.get_page(page)
+    async def render(self, page, *, first=False):
+        # rendered pages are kept around so going back doesn't fetch again
+        if not first and page in self._rendered:
+            self._rendered.move_to_end(page)
+            return self._rendered[page]
+
+        entries = await self.fetch_page(page)
         content = self.get_content(entries, page, first=first)
         embed = self.get_embed(entries, page, first=first)
+        rendered = (content, embed.copy() if embed is not None else None)
+        self._rendered[page] = rendered
+        while len(self._rendered) > self.cache_size:
+            self._rendered.popitem(last=False)
+        return rendered
+
+    async def show_page(self, page, *, first=False):
+        self.current_page = page
+        content, embed = await self.render(page, first=first)
 
         if not self.paginating:
             return await self.channel.send(content=content, embed=embed)
@@ -123,6 +469,8 @@ class Pages:
             return
 
         self.message = await self.channel.send(content=content, embed=embed)
+
+    async def add_reactions(self):
         for (reaction, _) in self.reaction_emojis:
             if self.maximum_pages == 2 and reaction in ('\u23ed', '\u23ee'):
                 # no |<< or >>| buttons if we only have two pages
@@ -132,8 +480,28 @@ class Pages:
 
             await self.message.add_reaction(reaction)
 
+    async def has_page(self, page):
+        if page <= 0:
+            return False
+        if self.maximum_pages is not None:
+            return page <= self.maximum_pages
+        if page in self._rendered:
+            return True
+
+        entries = await self.fetch_page(page)
+        if not entries:
+            if self.maximum_pages is None:
+                self.maximum_pages = page - 1
+            # footers rendered with an unknown page count are stale now
+            self._rendered.clear()
+            return False
+        if self.maximum_pages is not None:
+            self._rendered.clear()
+        self._prefetched = {page: entries}
+        return True
+
     async def checked_show_page(self, page):
-        if page != 0 and page <= self.maximum_pages:
+        if await self.has_page(page):
             await self.show_page(page)
 
     async def first_page(self):
@@ -142,7 +510,10 @@ class Pages:
 
     async def last_page(self):
         """goes to the last page"""
-        await self.show_page(self.maximum_pages)
+        page = self.current_page
+        while self.maximum_pages is None and await self.has_page(page + 1):
+            page += 1
+        await self.show_page(self.maximum_pages or page)
 
     async def next_page(self):
         """goes to the next page"""
@@ -174,10 +545,10 @@ class Pages:
         else:
             page = int(msg.content)
             to_delete.append(msg)
-            if page != 0 and page <= self.maximum_pages:
+            if await self.has_page(page):
                 await self.show_page(page)
             else:
-                to_delete.append(await self.channel.send(f'Invalid page given. ({page}/{self.maximum_pages})'))
+                to_delete.append(await self.channel.send(f'Invalid page given. ({page}/{self.page_count_text})'))
                 await asyncio.sleep(5)
 
         try:
@@ -204,65 +575,52 @@ class Pages:
             await asyncio.sleep(60.0)
             await self.show_current_page()
 
-        self.bot.loop.create_task(go_back_to_current_page())
+        self.track(go_back_to_current_page())
+
+    def track(self, coro):
+        """Runs ``coro`` in the background for as long as the session is open"""
+        return self.bot.paginators.track(self, coro)
 
     async def stop_pages(self):
         """stops the interactive pagination session"""
         await self.message.delete()
-        self.paginating = False
-
-    def react_check(self, reaction, user):
-        if user is None or user.id != self.author.id:
-            return False
+        await self.bot.paginators.close(self)
 
-        if reaction.message.id != self.message.id:
-            return False
+    def reaction_for(self, emoji):
+        for (reaction, func) in self.reaction_emojis:
+            if reaction == emoji:
+                return func
+        return None
 
-        for (emoji, func) in self.reaction_emojis:
-            if reaction.emoji == emoji:
-                self.match = func
-                return True
-        return False
+    async def expire(self):
+        if self.delete_after:
+            try:
+                await self.message.delete()
+            except discord.HTTPException:
+                pass
+        else:
+            try:
+                await self.message.clear_reactions()
+            except discord.HTTPException:
+                pass
 
     async def paginate(self):
         """Actually paginate the entries and run the interactive loop if necessary."""
-        first_page = self.show_page(1, first=True)
+        await self.show_page(1, first=True)
         if not self.paginating:
-            await first_page
-        else:
-            # allow us to react to reactions right away if we're paginating
-            self.bot.loop.create_task(first_page)
-
-        while self.paginating:
-            try:
-                reaction, user = await self.bot.wait_for('reaction_add', check=self.react_check, timeout=60.0)
-            except asyncio.TimeoutError:
-                self.paginating = False
-                if self.delete_after:
-                    try:
-                        await self.message.delete()
-                    except:
-                        pass
-                    finally:
-                        break
-                else:
-                    try:
-                        await self.message.clear_reactions()
-                    except: pass
-                    finally: break
-
-            try:
-                await self.message.remove_reaction(reaction, user)
-            except:
-                pass # can't remove it so don't bother doing so
+            return
 
-            await self.match()
+        # the reactions go on in the background so navigation works right away
+        self.closed = asyncio.Event()
+        self.bot.paginators.open(self)
+        self.track(self.add_reactions())
+        await self.closed.wait()
 
 class FieldPages(Pages):
     """Similar to Pages except entries should be a list of
     tuples having (key, value) to show as embed fields instead.
     """
-    def __init__(self, ctx, *, entries, per_page=12, show_entry_count=True, description=None, title=None, embed_color = discord.Color.blurple(), **kwargs):
+    def __init__(self, ctx, *, entries=None, per_page=12, show_entry_count=True, description=None, title=None, embed_color = discord.Color.blurple(), **kwargs):
         super().__init__(ctx, entries=entries, per_page=per_page, show_entry_count=show_entry_count, title=title, embed_color=embed_color, **kwargs)
         self.description = description
 
@@ -274,31 +632,38 @@ class FieldPages(Pages):
         for key, value in entries:
             self.embed.add_field(name=key, value=value, inline=False)
 
-        if self.maximum_pages > 1:
-            if self.show_entry_count:
-                text = f'Page {page}/{self.maximum_pages} ({len(self.entries)} entries)'
+        if self.paginating:
+            if self.show_entry_count and self.source.total is not None:
+                text = f'Page {page}/{self.page_count_text} ({self.source.total} entries)'
             else:
-                text = f'Page {page}/{self.maximum_pages}'
+                text = f'Page {page}/{self.page_count_text}'
 
             self.embed.set_footer(text=text)
 
 class TextPages(Pages):
-    """Uses a commands.Paginator internally to paginate some text."""
+    """Uses a commands.Paginator internally to paginate some text.
 
-    def __init__(self, ctx, text, *, prefix='```', suffix='```', max_size=2000):
-        paginator = CommandPaginator(prefix=prefix, suffix=suffix, max_size=max_size - 200)
-        for line in text.split('\n'):
-            paginator.add_line(line)
+    When ``text`` isn't a string but a generator or file-like object the
+    pages are streamed through a :class:`TextPageSource` instead, so big
+    outputs don't have to be split up front.
+    """
 
-        super().__init__(ctx, entries=paginator.pages, per_page=1, show_entry_count=False)
+    def __init__(self, ctx, text, *, prefix='```', suffix='```', max_size=2000, resident=10):
+        if isinstance(text, str):
+            paginator = CommandPaginator(prefix=prefix, suffix=suffix, max_size=max_size - 200)
+            for line in text.split('\n'):
+                paginator.add_line(line)
+            source = ListPageSource(paginator.pages, 1)
+        else:
+            source = TextPageSource(text, prefix=prefix, suffix=suffix, max_size=max_size - 200, resident=resident)
 
-    def get_page(self, page):
-        return self.entries[page - 1]
+        super().__init__(ctx, source=source, per_page=1, show_entry_count=False)
 
     def get_embed(self, entries, page, *, first=False):
         return None
 
-    def get_content(self, entry, page, *, first=False):
-        if self.maximum_pages > 1:
-            return f'{entry}\nPage {page}/{self.maximum_pages}'
+    def get_content(self, entries, page, *, first=False):
+        entry = entries[0] if entries else ''
+        if self.paginating:
+            return f'{entry}\nPage {page}/{self.page_count_text}'
         return entry
\ No newline at end of file
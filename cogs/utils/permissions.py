@@ -0,0 +1,59 @@
+import discord
+
+from .batch import BatchQueue
+
+
+class OverwriteFanout:
+    """Applies permission overwrites to many channels concurrently.
+
+    Permission routes are bucketed per channel, so channels can be
+    updated in parallel through a :class:`BatchQueue`. Channels that
+    already have the wanted overwrite are skipped without a request.
+    """
+    def __init__(self, queue=None):
+        self.queue = queue or BatchQueue()
+
+    @staticmethod
+    def is_applied(channel, target, overwrite):
+        current = channel.overwrites_for(target)
+        for name, value in overwrite:
+            if value is not None and getattr(current, name) != value:
+                return False
+        return True
+
+    @staticmethod
+    def merged(channel, target, overwrite):
+        current = channel.overwrites_for(target)
+        current.update(**{name: value for name, value in overwrite if value is not None})
+        return current
+
+    async def apply(self, jobs, *, reason=None, progress=None):
+        """Applies ``(channel, target, overwrite)`` jobs.
+
+        ``progress`` is an optional coroutine function called with
+        ``(done, total)`` every now and then and once at the end.
+
+        Returns a ``(applied, skipped, failed)`` tuple.
+        """
+        pending = []
+        skipped = 0
+        for job in jobs:
+            if self.is_applied(*job):
+                skipped += 1
+            else:
+                pending.append(job)
+
+        async def action(job):
+            channel, target, overwrite = job
+            await channel.set_permissions(target, overwrite=self.merged(channel, target, overwrite), reason=reason)
+
+        applied, failed = await self.queue.run(pending, action, progress=progress, done=skipped)
+        return len(applied), skipped, len(failed)
+
+def muted_overwrite(channel):
+    """The overwrite a Muted role needs in ``channel``"""
+    if isinstance(channel, discord.VoiceChannel):
+        return discord.PermissionOverwrite(speak=False)
+    if isinstance(channel, discord.CategoryChannel):
+        return discord.PermissionOverwrite(send_messages=False, add_reactions=False, speak=False)
+    return discord.PermissionOverwrite(send_messages=False, add_reactions=False)
@@ -0,0 +1,88 @@
+import asyncio
+import collections
+import threading
+
+from .breaker import Breakers
+
+
+class PrefetchPool:
+    """Keeps a few values ready for blocking, slow-to-fetch sources.
+
+    A daemon worker thread tops up a small queue per category. Taking a
+    value is instant when the queue has one (a hit), otherwise the value
+    is fetched in the default executor (a miss).
+
+    Parameters
+    ------------
+    sources: Dict[str, Callable[[], Any]]
+        Maps a category name to the blocking function producing a value.
+    size: int
+        How many values to keep ready per category.
+    interval: float
+        How long the worker sleeps once every queue is full.
+    limiter: Optional[RateLimiter]
+        Throttles the sources. The worker only uses tokens that are free
+        right away, so it never holds up commands.
+    hosts: Dict[str, str]
+        Maps a category name to the host its source talks to.
+    breakers: Optional[Breakers]
+        Circuit breakers for those hosts.
+    """
+    def __init__(self, sources, *, loop=None, size=10, interval=5.0, limiter=None, hosts=None, breakers=None):
+        self.loop = loop or asyncio.get_event_loop()
+        self.sources = dict(sources)
+        self.limiter = limiter
+        self.hosts = hosts or {}
+        self.breakers = breakers or Breakers()
+        self.size = size
+        self.interval = interval
+        self.queues = {name: collections.deque(maxlen=size) for name in self.sources}
+        self.hits = collections.Counter()
+        self.misses = collections.Counter()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._worker, name='prefetch-pool', daemon=True)
+        self._thread.start()
+
+    def _worker(self):
+        while not self._stopped.is_set():
+            for name, fetch in self.sources.items():
+                queue = self.queues[name]
+                while len(queue) < self.size and not self._stopped.is_set():
+                    host = self.hosts.get(name)
+                    if self.limiter is not None and not self.limiter.try_acquire(host):
+                        break
+                    try:
+                        self.breakers.check(host)
+                        with self.breakers.record(host):
+                            value = fetch()
+                        queue.append(value)
+                    except Exception:
+                        # upstream is unhappy, try again on the next round
+                        break
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+
+    async def get(self, name, guild_id=None):
+        queue = self.queues[name]
+        try:
+            value = queue.popleft()
+        except IndexError:
+            self.misses[name] += 1
+            host = self.hosts.get(name)
+            self.breakers.check(host)
+            if self.limiter is not None:
+                await self.limiter.acquire(host, guild_id)
+            with self.breakers.record(host):
+                value = await self.loop.run_in_executor(None, self.sources[name])
+        else:
+            self.hits[name] += 1
+        self._wakeup.set()
+        return value
+
+    def stats(self):
+        return {name: (self.hits[name], self.misses[name], len(self.queues[name])) for name in self.sources}
+
+    def close(self):
+        self._stopped.set()
+        self._wakeup.set()
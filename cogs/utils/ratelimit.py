@@ -0,0 +1,169 @@
+import asyncio
+import collections
+import threading
+import time
+
+
+class RateLimited(Exception):
+    """Raised when a request would have to wait longer than its deadline"""
+    def __init__(self, host, retry_after):
+        self.host = host
+        self.retry_after = retry_after
+        super().__init__(f'{host} is busy right now, try again in {retry_after:.1f} seconds')
+
+def parse_limits(value):
+    """Parses ``"host=rate:burst,host=rate:burst"`` style limits"""
+    limits = {}
+    if not value:
+        return limits
+    for part in value.split(','):
+        host, _, limit = part.strip().partition('=')
+        rate, _, burst = limit.partition(':')
+        limits[host] = (float(rate), float(burst or rate))
+    return limits
+
+class TokenBucket:
+    """Allows ``rate`` requests a second with bursts of up to ``burst``.
+
+    Tokens may go negative: a request that has to wait takes its token
+    straight away, so later requests queue up behind it.
+    """
+    def __init__(self, rate, burst, now=None):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic() if now is None else now
+
+    def refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, now):
+        """Seconds until a token is free"""
+        self.refill(now)
+        return max(0.0, (1 - self.tokens) / self.rate)
+
+    def full(self, now):
+        """Whether the bucket would be full at ``now``, without refilling it"""
+        return self.tokens + (now - self.updated) * self.rate >= self.burst
+
+class RateLimiter:
+    """Client side token buckets for the upstream APIs the bot talks to.
+
+    Every host in ``limits`` gets a bucket shared by the whole bot. A
+    request made on behalf of a guild also takes a token from that guild's
+    own bucket, which only gets ``share`` of the host's rate and burst so
+    one busy guild can't use up the limit for everyone. Requests wait in
+    line for a token, unless the wait is longer than their deadline in
+    which case :exc:`RateLimited` is raised right away. Hosts without a
+    limit are never throttled.
+
+    The limiter is thread safe, so blocking libraries running in threads
+    can use it as well.
+
+    Parameters
+    ------------
+    limits: Dict[str, Tuple[float, float]]
+        Maps a host name to its ``(rate, burst)``.
+    share: float
+        The part of a host's limit a single guild may use.
+    deadline: float
+        How long a request waits for a token by default.
+    max_guilds: int
+        How many guild buckets are kept per host before idle ones are dropped.
+    """
+    def __init__(self, limits, *, share=0.5, deadline=2.0, max_guilds=1000):
+        self.limits = dict(limits)
+        self.share = share
+        self.deadline = deadline
+        self.max_guilds = max_guilds
+        self.buckets = {host: TokenBucket(rate, burst) for host, (rate, burst) in self.limits.items()}
+        self.guild_buckets = collections.defaultdict(dict)
+        self.allowed = collections.Counter()
+        self.delayed = collections.Counter()
+        self.rejected = collections.Counter()
+        self._lock = threading.Lock()
+
+    def guild_bucket(self, host, guild_id, now):
+        buckets = self.guild_buckets[host]
+        bucket = buckets.get(guild_id)
+        if bucket is None:
+            if len(buckets) >= self.max_guilds:
+                for key, idle in list(buckets.items()):
+                    if idle.full(now):
+                        del buckets[key]
+            if len(buckets) >= self.max_guilds:
+                # every guild is still busy, drop the one used least recently
+                del buckets[min(buckets, key=lambda key: buckets[key].updated)]
+            rate, burst = self.limits[host]
+            # stamped with the caller's now so a new bucket doesn't start just below full
+            bucket = buckets[guild_id] = TokenBucket(rate * self.share, max(1.0, burst * self.share), now)
+        return bucket
+
+    def _buckets(self, host, guild_id, now):
+        bucket = self.buckets.get(host)
+        if bucket is None:
+            return []
+        if guild_id is None:
+            return [bucket]
+        return [bucket, self.guild_bucket(host, guild_id, now)]
+
+    def reserve(self, host, guild_id=None, deadline=None):
+        """Takes a token and returns how long to wait before using it"""
+        if deadline is None:
+            deadline = self.deadline
+        with self._lock:
+            now = time.monotonic()
+            buckets = self._buckets(host, guild_id, now)
+            if not buckets:
+                return 0.0
+
+            delay = max(bucket.delay(now) for bucket in buckets)
+            if delay > deadline:
+                self.rejected[host] += 1
+                raise RateLimited(host, delay)
+
+            for bucket in buckets:
+                bucket.tokens -= 1
+            if delay:
+                self.delayed[host] += 1
+            else:
+                self.allowed[host] += 1
+            return delay
+
+    def refund(self, host, guild_id=None):
+        with self._lock:
+            for bucket in self._buckets(host, guild_id, time.monotonic()):
+                bucket.tokens = min(bucket.burst, bucket.tokens + 1)
+
+    def try_acquire(self, host, guild_id=None):
+        """Takes a token only if one is free right now"""
+        try:
+            self.reserve(host, guild_id, deadline=0.0)
+        except RateLimited:
+            return False
+        return True
+
+    async def acquire(self, host, guild_id=None, *, deadline=None):
+        delay = self.reserve(host, guild_id, deadline)
+        if delay:
+            try:
+                await asyncio.sleep(delay)
+            except asyncio.CancelledError:
+                self.refund(host, guild_id)
+                raise
+
+    def stats(self):
+        """``{host: (tokens, allowed, delayed, rejected)}``"""
+        with self._lock:
+            now = time.monotonic()
+            for bucket in self.buckets.values():
+                bucket.refill(now)
+            return {
+                host: (bucket.tokens, self.allowed[host], self.delayed[host], self.rejected[host])
+                for host, bucket in self.buckets.items()
+            }
+
+def share_key(ctx):
+    """Who a command's requests are charged to: its guild, or the author in DMs"""
+    return ctx.guild.id if ctx.guild is not None else ctx.author.id
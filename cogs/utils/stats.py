@@ -0,0 +1,193 @@
+import collections
+
+import discord
+
+
+class GuildStats:
+    """Channel and member counters kept up to date from gateway events.
+
+    Every guild has a :class:`collections.Counter` with the keys ``text``,
+    ``voice``, ``online``, ``idle``, ``dnd``, ``offline``, ``bots`` and
+    ``humans``. ``totals`` holds the sum over every guild. Guilds are
+    counted once when they become available and after that only adjusted.
+    """
+    events = (
+        'on_ready', 'on_guild_available', 'on_guild_join', 'on_guild_remove', 'on_guild_unavailable',
+        'on_guild_channel_create', 'on_guild_channel_delete',
+        'on_member_join', 'on_member_remove', 'on_member_update'
+    )
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.guilds = {}
+        self.totals = collections.Counter()
+
+    @staticmethod
+    def channel_key(channel):
+        if isinstance(channel, discord.TextChannel):
+            return 'text'
+        if isinstance(channel, discord.VoiceChannel):
+            return 'voice'
+        return None
+
+    @staticmethod
+    def status_key(status):
+        if status in (discord.Status.online, discord.Status.idle, discord.Status.dnd):
+            return status.value
+        # invisible members show up as offline to us anyway
+        return 'offline'
+
+    def count(self, guild):
+        counter = collections.Counter()
+        for channel in guild.channels:
+            key = self.channel_key(channel)
+            if key is not None:
+                counter[key] += 1
+        for member in guild.members:
+            counter[self.status_key(member.status)] += 1
+            counter['bots' if member.bot else 'humans'] += 1
+        return counter
+
+    def add_guild(self, guild):
+        self.remove_guild(guild)
+        counter = self.guilds[guild.id] = self.count(guild)
+        self.totals.update(counter)
+
+    def remove_guild(self, guild):
+        counter = self.guilds.pop(guild.id, None)
+        if counter is not None:
+            self.totals.subtract(counter)
+
+    def get(self, guild):
+        counter = self.guilds.get(guild.id)
+        if counter is None:
+            self.add_guild(guild)
+            counter = self.guilds[guild.id]
+        return counter
+
+    def adjust(self, guild, key, amount):
+        counter = self.guilds.get(guild.id)
+        if counter is None:
+            # the full count will be taken when the guild becomes available
+            return
+        counter[key] += amount
+        self.totals[key] += amount
+
+    async def on_ready(self):
+        self.guilds.clear()
+        self.totals.clear()
+        for guild in self.bot.guilds:
+            self.add_guild(guild)
+
+    async def on_guild_available(self, guild):
+        self.add_guild(guild)
+
+    async def on_guild_join(self, guild):
+        self.add_guild(guild)
+
+    async def on_guild_remove(self, guild):
+        self.remove_guild(guild)
+
+    async def on_guild_unavailable(self, guild):
+        self.remove_guild(guild)
+
+    async def on_guild_channel_create(self, channel):
+        key = self.channel_key(channel)
+        if key is not None:
+            self.adjust(channel.guild, key, 1)
+
+    async def on_guild_channel_delete(self, channel):
+        key = self.channel_key(channel)
+        if key is not None:
+            self.adjust(channel.guild, key, -1)
+
+    async def on_member_join(self, member):
+        self.adjust(member.guild, self.status_key(member.status), 1)
+        self.adjust(member.guild, 'bots' if member.bot else 'humans', 1)
+
+    async def on_member_remove(self, member):
+        self.adjust(member.guild, self.status_key(member.status), -1)
+        self.adjust(member.guild, 'bots' if member.bot else 'humans', -1)
+
+    async def on_member_update(self, before, after):
+        old = self.status_key(before.status)
+        new = self.status_key(after.status)
+        if old != new:
+            self.adjust(after.guild, old, -1)
+            self.adjust(after.guild, new, 1)
+
+    def setup(self):
+        for event in self.events:
+            self.bot.add_listener(getattr(self, event), event)
+
+class MemberIndex:
+    """Maps a user id to how many of our guilds they are in.
+
+    The member ids of every indexed guild are kept as well, so a guild
+    leaving (or becoming unavailable) can be subtracted exactly.
+    """
+    events = (
+        'on_ready', 'on_guild_available', 'on_guild_join', 'on_guild_remove', 'on_guild_unavailable',
+        'on_member_join', 'on_member_remove'
+    )
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.members = {}
+        self.counts = collections.Counter()
+
+    def shared(self, user_id):
+        return self.counts.get(user_id, 0)
+
+    def add_guild(self, guild):
+        self.remove_guild(guild)
+        ids = self.members[guild.id] = {m.id for m in guild.members}
+        self.counts.update(ids)
+
+    def remove_guild(self, guild):
+        ids = self.members.pop(guild.id, None)
+        if ids is None:
+            return
+        for user_id in ids:
+            self.discard(user_id)
+
+    def discard(self, user_id):
+        count = self.counts[user_id] - 1
+        if count > 0:
+            self.counts[user_id] = count
+        else:
+            del self.counts[user_id]
+
+    async def on_ready(self):
+        self.members.clear()
+        self.counts.clear()
+        for guild in self.bot.guilds:
+            self.add_guild(guild)
+
+    async def on_guild_available(self, guild):
+        self.add_guild(guild)
+
+    async def on_guild_join(self, guild):
+        self.add_guild(guild)
+
+    async def on_guild_remove(self, guild):
+        self.remove_guild(guild)
+
+    async def on_guild_unavailable(self, guild):
+        self.remove_guild(guild)
+
+    async def on_member_join(self, member):
+        ids = self.members.get(member.guild.id)
+        if ids is not None and member.id not in ids:
+            ids.add(member.id)
+            self.counts[member.id] += 1
+
+    async def on_member_remove(self, member):
+        ids = self.members.get(member.guild.id)
+        if ids is not None and member.id in ids:
+            ids.remove(member.id)
+            self.discard(member.id)
+
+    def setup(self):
+        for event in self.events:
+            self.bot.add_listener(getattr(self, event), event)
@@ -0,0 +1,104 @@
+import asyncio
+import collections
+import concurrent.futures
+import hashlib
+import threading
+
+from googletrans import Translator
+
+from .breaker import Breakers
+
+Translation = collections.namedtuple('Translation', 'text src dest')
+
+class TranslationEngine:
+    """Runs googletrans off the event loop.
+
+    Results are kept in an LRU cache keyed by a hash of the text and the
+    target language. Concurrent requests for the same text share a single
+    future, every other text is translated on its own worker thread.
+
+    Parameters
+    ------------
+    workers: int
+        Size of the thread pool used for upstream calls.
+    cache_size: int
+        How many translations to keep.
+    limiter: Optional[RateLimiter]
+        Throttles requests that aren't cached or already pending.
+    breakers: Optional[Breakers]
+        Circuit breakers, upstream calls report to the Google Translate one.
+    """
+    HOST = 'translate.google.com'
+
+    def __init__(self, *, loop=None, workers=2, cache_size=1024, limiter=None, breakers=None):
+        self.loop = loop or asyncio.get_event_loop()
+        self.limiter = limiter
+        self.breakers = breakers or Breakers()
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+        self.cache_size = cache_size
+        self.cache = collections.OrderedDict()
+        self.pending = {}
+        self._local = threading.local()
+
+    @staticmethod
+    def key(text, dest):
+        return hashlib.sha1(f'{dest}\0{text}'.encode('utf-8')).hexdigest()
+
+    def _translator(self):
+        # googletrans keeps per-instance HTTP state, so each worker gets its own
+        translator = getattr(self._local, 'translator', None)
+        if translator is None:
+            translator = self._local.translator = Translator()
+        return translator
+
+    def _translate(self, text, dest):
+        # googletrans sends one request per text even when given a list
+        result = self._translator().translate(text, dest=dest)
+        return Translation(result.text, result.src, result.dest)
+
+    def _remember(self, key, value):
+        self.cache[key] = value
+        self.cache.move_to_end(key)
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+    async def _run(self, text, dest, key, future):
+        try:
+            with self.breakers.record(self.HOST):
+                result = await self.loop.run_in_executor(self.executor, self._translate, text, dest)
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+        else:
+            self._remember(key, result)
+            if not future.done():
+                future.set_result(result)
+        finally:
+            self.pending.pop(key, None)
+
+    async def translate(self, text, dest='en', *, guild_id=None):
+        key = self.key(text, dest)
+        cached = self.cache.get(key)
+        if cached is not None:
+            self.cache.move_to_end(key)
+            return cached
+
+        if key not in self.pending:
+            self.breakers.check(self.HOST)
+            if self.limiter is not None:
+                await self.limiter.acquire(self.HOST, guild_id)
+                # someone else may have asked for the same text while we waited
+                cached = self.cache.get(key)
+                if cached is not None:
+                    return cached
+
+        future = self.pending.get(key)
+        if future is None:
+            future = self.pending[key] = self.loop.create_future()
+            self.loop.create_task(self._run(text, dest, key, future))
+
+        # shield so one cancelled command doesn't cancel everyone waiting on it
+        return await asyncio.shield(future)
+
+    def close(self):
+        self.executor.shutdown(wait=False)
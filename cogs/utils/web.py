@@ -0,0 +1,100 @@
+import asyncio
+import contextlib
+import urllib.parse
+
+import aiohttp
+
+
+class WebClient:
+    """A pooled aiohttp client shared by every cog.
+
+    The underlying session is created lazily so it is always bound to
+    the running event loop, and is reused for the lifetime of the bot.
+    When a :class:`RateLimiter` is given every request waits for a token
+    of its host first, charged to ``guild_id`` when one is passed. With
+    :class:`Breakers` requests to a host whose circuit is open fail right
+    away, and connection errors, timeouts and 5xx/429 responses count as
+    failures of that host.
+
+    Parameters
+    ------------
+    limit: int
+        Maximum number of simultaneous connections.
+    limit_per_host: int
+        Maximum number of simultaneous connections to a single host.
+    timeout: float
+        Total timeout in seconds for a single request.
+    dns_ttl: int
+        How long resolved host names are cached, in seconds.
+    limiter: Optional[RateLimiter]
+        Throttles outgoing requests per host.
+    breakers: Optional[Breakers]
+        Circuit breakers for the hosts requests are sent to.
+    """
+    def __init__(self, *, loop=None, limit=100, limit_per_host=10, timeout=10.0, dns_ttl=300, limiter=None, breakers=None):
+        self.loop = loop
+        self.limiter = limiter
+        self.breakers = breakers
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.dns_ttl = dns_ttl
+        self._session = None
+
+    @property
+    def session(self):
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                ttl_dns_cache=self.dns_ttl,
+                loop=self.loop
+            )
+            self._session = aiohttp.ClientSession(connector=connector, timeout=self.timeout, loop=self.loop)
+        return self._session
+
+    def report(self, host, ok):
+        if self.breakers is not None:
+            if ok:
+                self.breakers.success(host)
+            else:
+                self.breakers.failure(host)
+
+    @contextlib.asynccontextmanager
+    async def request(self, method, url, *, guild_id=None, deadline=None, **kwargs):
+        host = urllib.parse.urlsplit(url).hostname
+        if self.breakers is not None:
+            self.breakers.check(host)
+        if self.limiter is not None:
+            await self.limiter.acquire(host, guild_id, deadline=deadline)
+
+        responded = False
+        try:
+            async with self.session.request(method, url, **kwargs) as resp:
+                responded = True
+                self.report(host, resp.status < 500 and resp.status != 429)
+                yield resp
+        except (aiohttp.ClientError, asyncio.TimeoutError, asyncio.CancelledError):
+            # errors raised while handling the response aren't the host's fault
+            if not responded:
+                self.report(host, False)
+            raise
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    async def get_json(self, url, **kwargs):
+        async with self.get(url, **kwargs) as resp:
+            resp.raise_for_status()
+            # some upstreams answer with text/plain or text/html
+            return await resp.json(content_type=None)
+
+    async def get_text(self, url, **kwargs):
+        async with self.get(url, **kwargs) as resp:
+            resp.raise_for_status()
+            return await resp.text()
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
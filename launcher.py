@@ -0,0 +1,164 @@
+import asyncio
+import json
+import os
+import signal
+import sys
+
+CLUSTERS = int(os.getenv("CLUSTERS", "2"))
+SHARD_COUNT = int(os.getenv("SHARD_COUNT", str(CLUSTERS)))
+IPC_SOCKET = os.getenv("IPC_SOCKET", "/tmp/c02-ipc.sock")
+
+def shard_ranges(shard_count, clusters):
+	"""Splits the shards into ``clusters`` contiguous ranges"""
+	clusters = max(1, min(clusters, shard_count))
+	per_cluster, extra = divmod(shard_count, clusters)
+	start = 0
+	for cluster_id in range(clusters):
+		size = per_cluster + (1 if cluster_id < extra else 0)
+		yield range(start, start + size)
+		start += size
+
+class IPCServer:
+	"""Relays gather requests between the clusters"""
+	def __init__(self, path, *, timeout=5.0):
+		self.path = path
+		self.timeout = timeout
+		self.clients = {}
+		self.locks = {}
+		self.pending = {}
+		self.server = None
+
+	async def start(self):
+		if os.path.exists(self.path):
+			os.unlink(self.path)
+		self.server = await asyncio.start_unix_server(self.handle, path=self.path)
+
+	async def send(self, writer, msg):
+		lock = self.locks.setdefault(writer, asyncio.Lock())
+		async with lock:
+			writer.write(json.dumps(msg).encode("utf-8") + b"\n")
+			await writer.drain()
+
+	async def handle(self, reader, writer):
+		cluster_id = None
+		try:
+			while True:
+				line = await reader.readline()
+				if not line:
+					break
+				msg = json.loads(line)
+				op = msg.get("op")
+				if op == "identify":
+					cluster_id = msg["cluster"]
+					self.clients[cluster_id] = writer
+					print(f"[IPC] Cluster {cluster_id} connected")
+				elif op == "gather":
+					asyncio.get_event_loop().create_task(self.gather(writer, msg))
+				elif op == "reply":
+					pending = self.pending.get(msg["nonce"])
+					if pending is not None:
+						replies, expected, done = pending
+						replies[msg["cluster"]] = msg["data"]
+						if len(replies) >= expected:
+							done.set()
+		except (OSError, ValueError) as e:
+			print(f"[IPC] {e}")
+		finally:
+			if cluster_id is not None and self.clients.get(cluster_id) is writer:
+				del self.clients[cluster_id]
+				print(f"[IPC] Cluster {cluster_id} disconnected")
+			self.locks.pop(writer, None)
+			writer.close()
+
+	async def gather(self, origin, msg):
+		nonce = msg["nonce"]
+		targets = list(self.clients.values())
+		replies = {}
+		done = asyncio.Event()
+		self.pending[nonce] = (replies, len(targets), done)
+		command = {"op": "command", "nonce": nonce, "name": msg["name"], "args": msg.get("args", {})}
+		try:
+			for writer in targets:
+				try:
+					await self.send(writer, command)
+				except OSError:
+					pass
+			await asyncio.wait_for(done.wait(), self.timeout)
+		except asyncio.TimeoutError:
+			# answer with whatever the healthy clusters gave us
+			pass
+		finally:
+			del self.pending[nonce]
+
+		try:
+			await self.send(origin, {"op": "result", "nonce": nonce, "data": list(replies.values())})
+		except OSError:
+			pass
+
+	def close(self):
+		if self.server is not None:
+			self.server.close()
+		if os.path.exists(self.path):
+			os.unlink(self.path)
+
+class Supervisor:
+	"""Runs one bot process per cluster and restarts the ones that crash"""
+	def __init__(self, shard_count, clusters, ipc_path):
+		self.shard_count = shard_count
+		self.ranges = list(shard_ranges(shard_count, clusters))
+		self.ipc_path = ipc_path
+		self.processes = {}
+		self.stopped = asyncio.Event()
+
+	async def run_cluster(self, cluster_id, shards):
+		loop = asyncio.get_event_loop()
+		backoff = 1.0
+		env = dict(
+			os.environ,
+			SHARD_COUNT=str(self.shard_count),
+			SHARD_IDS=f"{shards[0]}-{shards[-1]}",
+			CLUSTER_ID=str(cluster_id),
+			IPC_SOCKET=self.ipc_path
+		)
+		while not self.stopped.is_set():
+			print(f"[Cluster {cluster_id}] Starting shards {shards[0]}-{shards[-1]}")
+			started = loop.time()
+			proc = self.processes[cluster_id] = await asyncio.create_subprocess_exec(sys.executable, "bot.py", env=env)
+			code = await proc.wait()
+			if self.stopped.is_set():
+				break
+
+			# a cluster that ran for a while gets a fresh backoff
+			if loop.time() - started > 60.0:
+				backoff = 1.0
+			print(f"[Cluster {cluster_id}] Exited with code {code}, restarting in {backoff:.0f}s")
+			# wake up early on shutdown instead of outliving the platform's kill timeout
+			try:
+				await asyncio.wait_for(self.stopped.wait(), backoff)
+			except asyncio.TimeoutError:
+				pass
+			backoff = min(backoff * 2, 60.0)
+
+	def stop(self):
+		self.stopped.set()
+		for proc in self.processes.values():
+			if proc.returncode is None:
+				proc.terminate()
+
+	async def run(self):
+		await asyncio.gather(*(self.run_cluster(i, shards) for i, shards in enumerate(self.ranges)))
+
+async def main():
+	ipc = IPCServer(IPC_SOCKET)
+	await ipc.start()
+	supervisor = Supervisor(SHARD_COUNT, CLUSTERS, IPC_SOCKET)
+	loop = asyncio.get_event_loop()
+	for sig in (signal.SIGINT, signal.SIGTERM):
+		loop.add_signal_handler(sig, supervisor.stop)
+	try:
+		await supervisor.run()
+	finally:
+		ipc.close()
+
+if __name__ == '__main__':
+	asyncio.get_event_loop().run_until_complete(main())